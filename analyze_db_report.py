@@ -3,123 +3,690 @@
 Анализирует данные как опытный DBA и генерирует отчет
 """
 
+import numpy as np
+import openpyxl
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
 import argparse
+import fnmatch
+import functools
 import glob
+import os
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils import column_index_from_string
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    # Без python-calamine листы читаются через openpyxl
+    CalamineWorkbook = None
 
 
 # Глобальные настройки
 DEFAULT_EXCEL_FILE = "20 RPS.xlsx"  # Файл по умолчанию
 
+# Листы и столбцы, которые используют анализаторы.
+# Остальные листы и столбцы при загрузке не читаются.
+SHEET_COLUMNS = {
+    'Properties': ['report_start1', 'report_end1', 'interval_duration_sec'],
+    'dbstat': [
+        'dbname', 'datsize', 'datsize_delta', 'blks_hit_pct', 'xact_commit', 'xact_rollback',
+        'deadlocks', 'temp_files', 'temp_bytes',
+    ],
+    'queries': ['hexqueryid', 'query_texts'],
+    'top_statements': [
+        'hexqueryid', 'dbname', 'username', 'calls',
+        'total_exec_time', 'total_time', 'mean_exec_time', 'mean_time', 'rows',
+        'shared_blks_hit', 'shared_blks_read', 'temp_blks_written', 'wal_bytes', 'wal_bytes_pct',
+    ],
+    'wal_stats': ['wal_records', 'wal_fpi', 'wal_bytes', 'wal_write_time', 'wal_sync_time'],
+    'top_tables': [
+        'dbname', 'schemaname', 'relname', 'n_live_tup', 'n_dead_tup', 'n_mod_since_analyze',
+        'seq_scan', 'idx_scan', 'relsize',
+    ],
+    'top_indexes': ['dbname', 'schemaname', 'relname', 'indexrelname', 'indexrelsize', 'idx_scan'],
+}
+REQUIRED_SHEETS = frozenset(SHEET_COLUMNS)
+
+# Пространства имен XML внутри xlsx (используются при прямом чтении листов из одной строки)
+XLSX_MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+XLSX_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+XLSX_PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+# Типы числовых столбцов известных листов: значения хранятся в numpy массивах, а не как объекты Python.
+# Целочисленный столбец с пропусками загружается как float64 (так же, как это делает pd.read_excel).
+SHEET_DTYPES = {
+    'Properties': {'interval_duration_sec': 'float64'},
+    'dbstat': {
+        'blks_hit_pct': 'float64', 'xact_commit': 'int64', 'xact_rollback': 'int64',
+        'deadlocks': 'int64', 'temp_files': 'int64',
+    },
+    'top_statements': {
+        'calls': 'int64', 'total_exec_time': 'float64', 'total_time': 'float64',
+        'mean_exec_time': 'float64', 'mean_time': 'float64', 'rows': 'int64',
+        'shared_blks_hit': 'int64', 'shared_blks_read': 'int64', 'temp_blks_written': 'int64',
+        'wal_bytes': 'int64', 'wal_bytes_pct': 'float64',
+    },
+    'wal_stats': {
+        'wal_records': 'int64', 'wal_fpi': 'int64', 'wal_bytes': 'int64',
+        'wal_write_time': 'float64', 'wal_sync_time': 'float64',
+    },
+    'top_tables': {
+        'n_live_tup': 'int64', 'n_dead_tup': 'int64', 'n_mod_since_analyze': 'int64',
+        'seq_scan': 'int64', 'idx_scan': 'int64',
+    },
+    'top_indexes': {'idx_scan': 'int64'},
+}
+
+
+def normalize_query_text(query_texts):
+    """Очищает текст запроса от лишних пробелов и переносов"""
+    return ' '.join(query_texts.split())
+
+
+def memoize_result(method):
+    """Кэширует результат метода анализатора на экземпляре по имени метода и аргументам"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        if key not in self._results:
+            self._results[key] = method(self, *args, **kwargs)
+        return self._results[key]
+    return wrapper
+
+
+def format_count_column(series, fmt='{:,}', blank_zero=False):
+    """
+    Форматирует целочисленный столбец для отчета одним проходом
+    
+    Args:
+        series: Series с числами
+        fmt: формат для целого значения
+        blank_zero: выводить пустую строку вместо нуля
+        
+    Returns:
+        Series: строки, пропуски заменены на пустую строку
+    """
+    shown = series.notna()
+    if blank_zero:
+        shown &= series != 0
+    return series.fillna(0).astype('int64').map(fmt.format).where(shown, '')
+
+
+def markdown_table(rows, columns):
+    """
+    Формирует GFM таблицу для отчета через DataFrame.to_markdown
+    
+    Args:
+        rows: список строк таблицы (кортежи уже отформатированных значений)
+        columns: заголовки столбцов
+        
+    Returns:
+        str: таблица в формате Markdown
+    """
+    # disable_numparse: значения уже отформатированы, tabulate не должен разбирать их как числа
+    return pd.DataFrame(rows, columns=columns).to_markdown(index=False, disable_numparse=True) + "\n"
+
+
+def format_text_column(series):
+    """Приводит столбец к строкам для отчета, пропуски заменяются на пустую строку"""
+    return series.map(str).where(series.notna(), '')
+
+
+def find_sheet_xml_path(archive, sheet_name):
+    """
+    Находит путь к XML листа внутри xlsx по имени листа
+    
+    Args:
+        archive: открытый xlsx (zipfile.ZipFile)
+        sheet_name: имя листа
+        
+    Returns:
+        str: путь к XML листа в архиве или None, если лист не найден
+    """
+    workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+    rel_id = None
+    for sheet in workbook.iter(f'{XLSX_MAIN_NS}sheet'):
+        if sheet.get('name') == sheet_name:
+            rel_id = sheet.get(f'{XLSX_REL_NS}id')
+            break
+    if rel_id is None:
+        return None
+    
+    rels = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    for rel in rels.iter(f'{XLSX_PKG_REL_NS}Relationship'):
+        if rel.get('Id') == rel_id:
+            target = rel.get('Target')
+            if target.startswith('/'):
+                return target.lstrip('/')
+            return posixpath.normpath(posixpath.join('xl', target))
+    return None
+
+
+def read_xml_rows(archive, sheet_path, limit):
+    """
+    Потоково читает первые непустые строки листа из XML и прекращает разбор
+    
+    Args:
+        archive: открытый xlsx (zipfile.ZipFile)
+        sheet_path: путь к XML листа в архиве
+        limit: сколько непустых строк прочитать
+        
+    Returns:
+        list: строки в виде словарей {номер столбца: (тип ячейки, значение из XML, индекс стиля или None)}
+    """
+    rows = []
+    with archive.open(sheet_path) as stream:
+        for _, elem in ET.iterparse(stream, events=('end',)):
+            if elem.tag != f'{XLSX_MAIN_NS}row':
+                continue
+            
+            cells = {}
+            next_col = 0
+            for cell in elem.iter(f'{XLSX_MAIN_NS}c'):
+                ref = cell.get('r')
+                col = column_index_from_string(ref.rstrip('0123456789')) - 1 if ref else next_col
+                next_col = col + 1
+                
+                cell_type = cell.get('t', 'n')
+                if cell_type == 'inlineStr':
+                    raw = ''.join(t.text or '' for t in cell.iter(f'{XLSX_MAIN_NS}t'))
+                else:
+                    value = cell.find(f'{XLSX_MAIN_NS}v')
+                    raw = value.text if value is not None else None
+                if raw:
+                    style = cell.get('s')
+                    cells[col] = (cell_type, raw, int(style) if style else None)
+            elem.clear()
+            
+            if cells:
+                rows.append(cells)
+                if len(rows) == limit:
+                    break
+    return rows
+
+
+def read_shared_strings(archive, indexes):
+    """
+    Читает из таблицы общих строк xlsx только строки с нужными индексами
+    
+    Args:
+        archive: открытый xlsx (zipfile.ZipFile)
+        indexes: множество индексов общих строк
+        
+    Returns:
+        dict: {индекс: строка}
+    """
+    if not indexes:
+        return {}
+    
+    strings = {}
+    last = max(indexes)
+    index = 0
+    with archive.open('xl/sharedStrings.xml') as stream:
+        for _, elem in ET.iterparse(stream, events=('end',)):
+            if elem.tag != f'{XLSX_MAIN_NS}si':
+                continue
+            if index in indexes:
+                strings[index] = ''.join(t.text or '' for t in elem.iter(f'{XLSX_MAIN_NS}t'))
+            elem.clear()
+            if index >= last:
+                break
+            index += 1
+    return strings
+
+
+def read_date_styles(archive):
+    """
+    Находит стили ячеек xlsx, числовой формат которых задает дату/время
+    
+    Args:
+        archive: открытый xlsx (zipfile.ZipFile)
+        
+    Returns:
+        dict: {индекс стиля (атрибут s ячейки): True для длительности ([h]:mm), иначе False}
+    """
+    try:
+        styles = ET.fromstring(archive.read('xl/styles.xml'))
+    except KeyError:
+        return {}
+    
+    custom_formats = {
+        int(fmt.get('numFmtId')): fmt.get('formatCode')
+        for fmt in styles.iter(f'{XLSX_MAIN_NS}numFmt')
+    }
+    
+    date_styles = {}
+    cell_xfs = styles.find(f'{XLSX_MAIN_NS}cellXfs')
+    if cell_xfs is None:
+        return date_styles
+    
+    for index, xf in enumerate(cell_xfs.findall(f'{XLSX_MAIN_NS}xf')):
+        fmt_id = int(xf.get('numFmtId', 0))
+        fmt_code = custom_formats.get(fmt_id, BUILTIN_FORMATS.get(fmt_id))
+        if fmt_code and is_date_format(fmt_code):
+            date_styles[index] = is_timedelta_format(fmt_code)
+    return date_styles
+
+
+def read_workbook_epoch(archive):
+    """Возвращает начало отсчета дат книги (система 1900 или 1904)"""
+    workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+    props = workbook.find(f'{XLSX_MAIN_NS}workbookPr')
+    if props is not None and props.get('date1904') in ('1', 'true'):
+        return CALENDAR_MAC_1904
+    return CALENDAR_WINDOWS_1900
+
+
+def read_first_row(excel_file, sheet_name):
+    """
+    Читает первую строку данных листа напрямую из XML внутри xlsx
+    
+    Разбор листа останавливается сразу после первой строки данных, поэтому
+    объем работы не зависит от длины листа.
+    
+    Args:
+        excel_file: путь к xlsx файлу
+        sheet_name: имя листа
+        
+    Returns:
+        dict: {заголовок: значение}; пустые ячейки не попадают в словарь.
+              Пустой словарь, если лист отсутствует или не содержит данных
+    """
+    with zipfile.ZipFile(excel_file) as archive:
+        sheet_path = find_sheet_xml_path(archive, sheet_name)
+        if sheet_path is None:
+            return {}
+        
+        rows = read_xml_rows(archive, sheet_path, 2)
+        if len(rows) < 2:
+            return {}
+        
+        shared_indexes = {int(raw) for row in rows for cell_type, raw, _ in row.values() if cell_type == 's'}
+        shared_strings = read_shared_strings(archive, shared_indexes)
+        
+        # Даты хранятся как числа; отличить их можно только по числовому формату стиля ячейки
+        styled = {style for row in rows for cell_type, _, style in row.values()
+                  if cell_type == 'n' and style is not None}
+        date_styles = read_date_styles(archive) if styled else {}
+        epoch = read_workbook_epoch(archive) if styled & date_styles.keys() else CALENDAR_WINDOWS_1900
+    
+    def convert(cell_type, raw, style):
+        if cell_type == 's':
+            return shared_strings.get(int(raw))
+        if cell_type == 'b':
+            return raw == '1'
+        if cell_type != 'n':
+            return raw
+        number = float(raw)
+        if style in date_styles:
+            return from_excel(number, epoch, timedelta=date_styles[style])
+        return int(number) if number.is_integer() else number
+    
+    header, data = rows
+    result = {}
+    for col, cell in data.items():
+        if col in header:
+            result[convert(*header[col])] = convert(*cell)
+    return result
+
+
+class LazySheets:
+    """Листы Excel файла, которые читаются при первом обращении"""
+    
+    def __init__(self, excel_file):
+        if CalamineWorkbook is not None:
+            # calamine (Rust) разбирает xlsx заметно быстрее и экономнее openpyxl
+            self._workbook = CalamineWorkbook.from_path(str(excel_file))
+            self._sheet_names = self._workbook.sheet_names
+        else:
+            # read_only: листы читаются потоково, без построения полного дерева ячеек в памяти
+            self._workbook = openpyxl.load_workbook(excel_file, read_only=True, data_only=True)
+            self._sheet_names = self._workbook.sheetnames
+        self._cache = {}
+        # Статусы загрузки листов копятся здесь и выводятся одним блоком
+        self.load_log = []
+    
+    def get(self, sheet_name, default=None):
+        """Возвращает лист по имени, читая его из файла только один раз"""
+        if sheet_name not in self._cache:
+            self._cache[sheet_name] = self._load(sheet_name)
+        sheet = self._cache[sheet_name]
+        return default if sheet is None else sheet
+    
+    def close(self):
+        """Закрывает Excel файл"""
+        self._workbook.close()
+    
+    def _load(self, sheet_name):
+        """Читает лист из файла; None, если лист не нужен анализу, отсутствует или не читается"""
+        if sheet_name not in REQUIRED_SHEETS or sheet_name not in self._sheet_names:
+            return None
+        
+        try:
+            sheet = self._read_sheet(self._iter_rows(sheet_name), SHEET_COLUMNS[sheet_name])
+            sheet = self._apply_dtypes(sheet, SHEET_DTYPES.get(sheet_name, {}))
+            self.load_log.append(f"  ✓ {sheet_name}: {len(sheet)} строк")
+            return sheet
+        except Exception as e:
+            self.load_log.append(f"  ✗ Ошибка загрузки {sheet_name}: {e}")
+            return None
+    
+    def _iter_rows(self, sheet_name):
+        """Возвращает итератор по строкам листа (значения ячеек)"""
+        if CalamineWorkbook is not None:
+            return self._workbook.get_sheet_by_name(sheet_name).iter_rows()
+        
+        worksheet = self._workbook[sheet_name]
+        # Размеры листа в файле могут быть записаны неверно - читаем до фактического конца
+        worksheet.reset_dimensions()
+        return worksheet.iter_rows(values_only=True)
+    
+    @staticmethod
+    def _convert_cell(value):
+        """Приводит значение ячейки к виду pd.read_excel: пустая строка - пропуск, целые float - int"""
+        if value == '':
+            return None
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        return value
+    
+    @classmethod
+    def _read_sheet(cls, rows, columns):
+        """
+        Читает лист Excel, оставляя только нужные столбцы
+        
+        Args:
+            rows: итератор по строкам листа, первая строка - заголовок
+            columns: список имен столбцов, которые нужно прочитать
+            
+        Returns:
+            DataFrame: данные листа
+        """
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+        
+        # Позиции нужных столбцов в строке (при дублях берется первый столбец)
+        positions = {}
+        for i, name in enumerate(header):
+            if name in columns and name not in positions:
+                positions[name] = i
+        names = list(positions)
+        indexes = list(positions.values())
+        
+        convert = cls._convert_cell
+        records = []
+        for row in rows:
+            # Полностью пустые строки пропускаем
+            if any(value is not None and value != '' for value in row):
+                records.append(tuple(convert(row[i]) if i < len(row) else None for i in indexes))
+        df = pd.DataFrame.from_records(records, columns=names, coerce_float=True)
+        
+        # Как и pd.read_excel, полностью пустой столбец считаем числовым (NaN)
+        for name in names:
+            if df[name].isna().all():
+                df[name] = df[name].astype('float64')
+        
+        return df
+    
+    @staticmethod
+    def _apply_dtypes(df, dtypes):
+        """
+        Приводит числовые столбцы листа к заданным типам
+        
+        Args:
+            df: данные листа
+            dtypes: словарь {столбец: тип}
+            
+        Returns:
+            DataFrame: данные с приведенными типами
+        """
+        for col, dtype in dtypes.items():
+            if col not in df.columns:
+                continue
+            if dtype == 'int64' and df[col].isna().any():
+                dtype = 'float64'
+            try:
+                df[col] = df[col].astype(dtype)
+            except (ValueError, TypeError):
+                # Нечисловые значения в столбце - оставляем как есть
+                pass
+        return df
+
 
 class PostgresAnalyzer:
     """Анализатор статистики PostgreSQL"""
     
     def __init__(self, excel_file):
         self.excel_file = excel_file
-        self.sheets = {}
+        self.sheets = None
+        self._query_text_map = None
+        # Очищенные тексты запросов по ID (кэш живет вместе с анализатором одного файла)
+        self._query_texts = {}
+        self._top_statements = None
+        # Результаты анализаторов (см. memoize_result)
+        self._results = {}
         self.load_data()
     
     def load_data(self):
-        """Загружает все листы из Excel файла"""
+        """Открывает Excel файл; листы загружаются по мере обращения к ним"""
         print("Загрузка данных из Excel...")
-        xl_file = pd.ExcelFile(self.excel_file)
+        self.sheets = LazySheets(self.excel_file)
+    
+    def close(self):
+        """Освобождает Excel файл"""
+        self.sheets.close()
+    
+    def _read_first_row(self, sheet_name):
+        """
+        Читает первую строку данных листа, минуя pandas
         
-        for sheet_name in xl_file.sheet_names:
-            try:
-                self.sheets[sheet_name] = pd.read_excel(xl_file, sheet_name=sheet_name)
-                print(f"  ✓ {sheet_name}: {len(self.sheets[sheet_name])} строк")
-            except Exception as e:
-                print(f"  ✗ Ошибка загрузки {sheet_name}: {e}")
+        Args:
+            sheet_name: имя листа
+            
+        Returns:
+            dict: {столбец: значение}; пустой словарь, если данных нет
+        """
+        try:
+            return read_first_row(self.excel_file, sheet_name)
+        except (zipfile.BadZipFile, KeyError, ET.ParseError):
+            # Не xlsx (например, xls) - читаем лист обычным способом
+            df = self.sheets.get(sheet_name, pd.DataFrame())
+            if df.empty:
+                return {}
+            first_row = df.head(1).to_dict(orient='records')[0]
+            return {col: value for col, value in first_row.items() if pd.notna(value)}
     
+    @staticmethod
+    def _project(df, columns):
+        """
+        Оставляет только нужные столбцы в заданном порядке
+        
+        Args:
+            df: исходный DataFrame
+            columns: словарь {столбец: значение по умолчанию для отсутствующего столбца}
+            
+        Returns:
+            DataFrame: DataFrame ровно с перечисленными столбцами
+        """
+        projected = df.reindex(columns=list(columns))
+        for col, default in columns.items():
+            if col not in df.columns:
+                projected[col] = default
+        return projected
+    
+    @memoize_result
     def get_report_period(self):
         """Получает период отчета"""
-        props = self.sheets.get('Properties', pd.DataFrame())
-        if props.empty:
+        props = self._read_first_row('Properties')
+        if not props:
             return "Не указан", "Не указан", 0
         
-        start = props['report_start1'].iloc[0] if 'report_start1' in props.columns else "Не указан"
-        end = props['report_end1'].iloc[0] if 'report_end1' in props.columns else "Не указан"
+        start = props.get('report_start1', "Не указан")
+        end = props.get('report_end1', "Не указан")
         
         # Вычисляем длительность в минутах
         try:
-            duration_sec = props['interval_duration_sec'].iloc[0]
+            duration_sec = props['interval_duration_sec']
             duration_min = int(duration_sec / 60)
         except:
             duration_min = 0
         
         return start, end, duration_min
     
+    @memoize_result
     def analyze_database_stats(self):
         """Анализирует общую статистику БД"""
         df = self.sheets.get('dbstat', pd.DataFrame())
         if df.empty:
             return []
         
-        results = []
+        # Проецируем нужные столбцы и приводим их к именам результата
+        columns = {
+            'dbname': 'Unknown',
+            'datsize': 'N/A',
+            'datsize_delta': 'N/A',
+            'blks_hit_pct': 0,
+            'xact_commit': 0,
+            'xact_rollback': 0,
+            'deadlocks': 0,
+            'temp_files': 0,
+            'temp_bytes': 0,
+        }
+        df = self._project(df, columns).rename(columns={
+            'datsize': 'size',
+            'datsize_delta': 'size_delta',
+            'blks_hit_pct': 'cache_hit_ratio',
+            'xact_commit': 'commits',
+            'xact_rollback': 'rollbacks',
+        })
         
-        for _, row in df.iterrows():
-            dbname = row.get('dbname', 'Unknown')
-            
-            # Основные метрики
-            cache_hit_ratio = row.get('blks_hit_pct', 0)
-            size = row.get('datsize', 'N/A')
-            size_delta = row.get('datsize_delta', 'N/A')
-            commits = row.get('xact_commit', 0)
-            rollbacks = row.get('xact_rollback', 0)
-            deadlocks = row.get('deadlocks', 0)
-            temp_files = row.get('temp_files', 0)
-            temp_bytes = row.get('temp_bytes', 0)
-            
-            # Оценка проблем
-            issues = []
-            if cache_hit_ratio < 95:
-                issues.append(f"⚠️ Низкий cache hit ratio: {cache_hit_ratio:.2f}%")
-            if deadlocks and deadlocks > 0:
-                issues.append(f"⚠️ Обнаружены deadlocks: {deadlocks}")
-            if temp_files and temp_files > 0:
-                issues.append(f"⚠️ Использование временных файлов: {temp_files} ({temp_bytes})")
-            
-            rollback_ratio = (rollbacks / (commits + rollbacks) * 100) if (commits + rollbacks) > 0 else 0
-            if rollback_ratio > 5:
-                issues.append(f"⚠️ Высокий процент rollback: {rollback_ratio:.2f}%")
-            
-            results.append({
-                'dbname': dbname,
-                'size': size,
-                'size_delta': size_delta,
-                'cache_hit_ratio': cache_hit_ratio,
-                'commits': commits,
-                'rollbacks': rollbacks,
-                'rollback_ratio': rollback_ratio,
-                'deadlocks': deadlocks,
-                'temp_files': temp_files,
-                'temp_bytes': temp_bytes,
-                'issues': issues
-            })
-        
-        return results
+        # Все пороговые проверки считаются сразу по всему столбцу
+        total_xacts = df['commits'] + df['rollbacks']
+        df['rollback_ratio'] = np.where(total_xacts > 0, df['rollbacks'] / total_xacts * 100, 0)
+        
+        low_cache = (df['cache_hit_ratio'] < 95).to_numpy()
+        has_deadlocks = (df['deadlocks'].fillna(0) > 0).to_numpy()
+        has_temp_files = (df['temp_files'].fillna(0) > 0).to_numpy()
+        high_rollback = (df['rollback_ratio'] > 5).to_numpy()
+        
+        # Оценка проблем: строки формируются только для сработавших проверок
+        issues = []
+        for (low, dl, tf, rb, cache_hit_ratio, deadlocks, temp_files, temp_bytes, rollback_ratio) in zip(
+                low_cache, has_deadlocks, has_temp_files, high_rollback,
+                df['cache_hit_ratio'].to_numpy(), df['deadlocks'].to_numpy(), df['temp_files'].to_numpy(),
+                df['temp_bytes'].to_numpy(), df['rollback_ratio'].to_numpy()):
+            db_issues = []
+            if low:
+                db_issues.append(f"⚠️ Низкий cache hit ratio: {cache_hit_ratio:.2f}%")
+            if dl:
+                db_issues.append(f"⚠️ Обнаружены deadlocks: {deadlocks}")
+            if tf:
+                db_issues.append(f"⚠️ Использование временных файлов: {temp_files} ({temp_bytes})")
+            if rb:
+                db_issues.append(f"⚠️ Высокий процент rollback: {rollback_ratio:.2f}%")
+            issues.append(db_issues)
+        df['issues'] = issues
+        
+        # Строковые представления для отчета, заменяя nan на пустую строку
+        df['size_str'] = format_text_column(df['size'])
+        df['size_delta_str'] = format_text_column(df['size_delta'])
+        df['commits_str'] = format_count_column(df['commits'])
+        df['rollbacks_str'] = format_count_column(df['rollbacks'])
+        df['rollback_ratio_str'] = df['rollback_ratio'].map('({:.2f}%)'.format).where(
+            df['rollback_ratio'].notna() & (df['rollbacks_str'] != ''), '')
+        df['deadlocks_str'] = format_count_column(df['deadlocks'], fmt='{}', blank_zero=True)
+        df['temp_files_str'] = format_count_column(df['temp_files'], fmt='{}', blank_zero=True)
+        
+        return df.to_dict(orient='records')
+    
+    def _get_query_text_map(self):
+        """Возвращает индекс hexqueryid -> текст запроса, строя его при первом обращении"""
+        if self._query_text_map is None:
+            # Индекс строится один раз, вместо фильтрации листа на каждый запрос
+            queries_df = self.sheets.get('queries', pd.DataFrame())
+            if queries_df.empty:
+                self._query_text_map = {}
+            else:
+                # При дублях ID используется первая строка, как и при прежней фильтрации
+                unique_df = queries_df.drop_duplicates(subset='hexqueryid')
+                self._query_text_map = dict(zip(unique_df['hexqueryid'], unique_df['query_texts']))
+        return self._query_text_map
     
     def get_query_text(self, query_id):
         """Получает текст запроса по его ID"""
-        queries_df = self.sheets.get('queries', pd.DataFrame())
-        if queries_df.empty:
-            return None
-        
-        query_row = queries_df[queries_df['hexqueryid'] == query_id]
-        if not query_row.empty:
-            query_texts = query_row['query_texts'].iloc[0]
+        if query_id not in self._query_texts:
+            query_texts = self._get_query_text_map().get(query_id)
             if isinstance(query_texts, str) and query_texts:
-                # Очищаем от лишних пробелов и переносов
-                text = ' '.join(query_texts.split())
-                return text
-        return None
+                self._query_texts[query_id] = normalize_query_text(query_texts)
+            else:
+                self._query_texts[query_id] = None
+        return self._query_texts[query_id]
     
+    def _query_previews(self, query_ids, length):
+        """
+        Формирует превью текстов для набора запросов
+        
+        Тексты очищаются только для уже отобранных запросов, а не для всего листа.
+        
+        Args:
+            query_ids: Series с ID запросов
+            length: максимальная длина превью
+            
+        Returns:
+            tuple: (список превью, список суффиксов '...' для обрезанных текстов)
+        """
+        previews = []
+        suffixes = []
+        for query_id in query_ids:
+            text = self.get_query_text(query_id)
+            if text:
+                previews.append(text[:length])
+                suffixes.append('...' if len(text) > length else '')
+            else:
+                previews.append('N/A')
+                suffixes.append('')
+        return previews, suffixes
+    
+    def _prepare_top_statements(self):
+        """
+        Готовит лист top_statements для анализа запросов
+        
+        Вычисляемые столбцы добавляются один раз и переиспользуются
+        в analyze_top_queries и analyze_top_wal_queries.
+        
+        Returns:
+            DataFrame: top_statements с доп. столбцами total_blks, cache_ratio, wal_mb
+        """
+        if self._top_statements is not None:
+            return self._top_statements
+        
+        df = self.sheets.get('top_statements', pd.DataFrame())
+        if not df.empty:
+            # Расчет cache hit ratio для запросов
+            blks = self._project(df, {'shared_blks_hit': 0, 'shared_blks_read': 0})
+            total_blks = blks['shared_blks_hit'] + blks['shared_blks_read']
+            cache_ratio = np.where(
+                total_blks > 0, blks['shared_blks_hit'] / total_blks.where(total_blks > 0) * 100, 100.0)
+            
+            df = df.assign(total_blks=total_blks, cache_ratio=cache_ratio)
+            if 'wal_bytes' in df.columns:
+                df['wal_mb'] = df['wal_bytes'] / (1024 * 1024)
+        
+        self._top_statements = df
+        return df
+    
+    @memoize_result
     def analyze_top_queries(self, top_n=10):
         """Анализирует самые тяжелые запросы"""
-        df = self.sheets.get('top_statements', pd.DataFrame())
+        df = self._prepare_top_statements()
         if df.empty:
             return []
         
@@ -127,62 +694,63 @@ class PostgresAnalyzer:
         time_col = 'total_exec_time' if 'total_exec_time' in df.columns else 'total_time'
         mean_col = 'mean_exec_time' if 'mean_exec_time' in df.columns else 'mean_time'
         
-        # Сортируем по общему времени выполнения
-        df_sorted = df.sort_values(by=time_col, ascending=False).head(top_n)
-        
-        results = []
-        for _, row in df_sorted.iterrows():
-            query_id = row.get('hexqueryid', 'N/A')
-            dbname = row.get('dbname', 'N/A')
-            username = row.get('username', 'N/A')
-            calls = row.get('calls', 0)
-            total_time = row.get(time_col, 0)
-            mean_time = row.get(mean_col, 0)
-            rows = row.get('rows', 0)
-            
-            # Получаем текст запроса
-            query_text = self.get_query_text(query_id)
-            query_preview = query_text[:100] if query_text else 'N/A'
-            query_preview_suffix = '...' if query_text and len(query_text) > 100 else ''
-            
-            # Анализ I/O
-            shared_blks_hit = row.get('shared_blks_hit', 0)
-            shared_blks_read = row.get('shared_blks_read', 0)
-            temp_blks_written = row.get('temp_blks_written', 0)
-            
-            # Расчет cache hit ratio для запроса
-            total_blks = shared_blks_hit + shared_blks_read
-            query_cache_ratio = (shared_blks_hit / total_blks * 100) if total_blks > 0 else 100
-            
-            # Проблемы
-            issues = []
-            if mean_time > 1000:
-                issues.append(f"Медленный запрос: {mean_time:.2f} мс")
-            if temp_blks_written > 0:
-                issues.append(f"Использует temp: {temp_blks_written} блоков")
-            if query_cache_ratio < 90:
-                issues.append(f"Низкий cache hit: {query_cache_ratio:.1f}%")
-            
-            results.append({
-                'query_id': query_id,
-                'query_preview': query_preview,
-                'query_preview_suffix': query_preview_suffix,
-                'dbname': dbname,
-                'username': username,
-                'calls': calls,
-                'total_time': total_time,
-                'mean_time': mean_time,
-                'rows': rows,
-                'cache_ratio': query_cache_ratio,
-                'temp_blks': temp_blks_written,
-                'issues': issues
-            })
-        
-        return results
+        # Выбираем top_n по общему времени выполнения (частичная сортировка)
+        df_sorted = df.nlargest(top_n, time_col)
+        
+        columns = {
+            'hexqueryid': 'N/A',
+            'dbname': 'N/A',
+            'username': 'N/A',
+            'calls': 0,
+            time_col: 0,
+            mean_col: 0,
+            'rows': 0,
+            'cache_ratio': 100.0,
+            'temp_blks_written': 0,
+        }
+        df_sorted = self._project(df_sorted, columns).rename(columns={
+            'hexqueryid': 'query_id',
+            time_col: 'total_time',
+            mean_col: 'mean_time',
+            'temp_blks_written': 'temp_blks',
+        })
+        
+        df_sorted['query_preview'], df_sorted['query_preview_suffix'] = self._query_previews(df_sorted['query_id'], 100)
+        
+        # Проблемы
+        slow = (df_sorted['mean_time'] > 1000).to_numpy()
+        uses_temp = (df_sorted['temp_blks'] > 0).to_numpy()
+        low_cache = (df_sorted['cache_ratio'] < 90).to_numpy()
+        
+        issues = []
+        for (is_slow, is_temp, is_low, mean_time, temp_blks, cache_ratio) in zip(
+                slow, uses_temp, low_cache,
+                df_sorted['mean_time'].to_numpy(), df_sorted['temp_blks'].to_numpy(), df_sorted['cache_ratio'].to_numpy()):
+            query_issues = []
+            if is_slow:
+                query_issues.append(f"Медленный запрос: {mean_time:.2f} мс")
+            if is_temp:
+                query_issues.append(f"Использует temp: {temp_blks} блоков")
+            if is_low:
+                query_issues.append(f"Низкий cache hit: {cache_ratio:.1f}%")
+            issues.append(query_issues)
+        df_sorted['issues'] = issues
+        
+        # Строковые представления счетчиков для отчета
+        df_sorted['calls_str'] = format_count_column(df_sorted['calls'])
+        df_sorted['rows_str'] = format_count_column(df_sorted['rows'], blank_zero=True)
+        df_sorted['temp_blks_str'] = format_count_column(df_sorted['temp_blks'])
+        
+        return df_sorted[[
+            'query_id', 'query_preview', 'query_preview_suffix', 'dbname', 'username', 'calls',
+            'total_time', 'mean_time', 'rows', 'cache_ratio', 'temp_blks', 'issues',
+            'calls_str', 'rows_str', 'temp_blks_str',
+        ]].to_dict(orient='records')
     
+    @memoize_result
     def analyze_top_wal_queries(self, top_n=5):
         """Анализирует топ запросов по генерации WAL"""
-        df = self.sheets.get('top_statements', pd.DataFrame())
+        df = self._prepare_top_statements()
         if df.empty:
             return []
         
@@ -191,50 +759,45 @@ class PostgresAnalyzer:
             return []
         
         # Фильтруем только запросы с WAL активностью
-        df_wal = df[df['wal_bytes'].notna() & (df['wal_bytes'] > 0)].copy()
+        df_wal = df[df['wal_bytes'].notna() & (df['wal_bytes'] > 0)]
         
         if df_wal.empty:
             return []
         
-        # Сортируем по wal_bytes
-        df_sorted = df_wal.sort_values(by='wal_bytes', ascending=False).head(top_n)
+        # Выбираем top_n по wal_bytes
+        df_sorted = df_wal.nlargest(top_n, 'wal_bytes')
         
-        results = []
-        for _, row in df_sorted.iterrows():
-            query_id = row.get('hexqueryid', 'N/A')
-            wal_bytes = row.get('wal_bytes', 0)
-            wal_bytes_pct = row.get('wal_bytes_pct', 0)
-            
-            query_text = self.get_query_text(query_id)
-            query_preview = query_text[:50] if query_text else 'N/A'
-            query_preview_suffix = '...' if query_text and len(query_text) > 50 else ''
-            
-            # Конвертируем в MB/GB
-            wal_mb = wal_bytes / (1024 * 1024)
-            wal_gb = wal_mb / 1024 if wal_mb > 1024 else 0
-            
-            results.append({
-                'query_id': query_id,
-                'query_preview': query_preview,
-                'query_preview_suffix': query_preview_suffix,
-                'dbname': row.get('dbname', 'N/A'),
-                'calls': row.get('calls', 0),
-                'wal_bytes': wal_bytes,
-                'wal_mb': round(wal_mb, 2),
-                'wal_gb': round(wal_gb, 3) if wal_gb > 0 else 0,
-                'wal_pct': round(wal_bytes_pct, 2) if wal_bytes_pct else 0
-            })
-        
-        return results
+        columns = {
+            'hexqueryid': 'N/A',
+            'dbname': 'N/A',
+            'calls': 0,
+            'wal_bytes': 0,
+            'wal_mb': 0,
+            'wal_bytes_pct': 0,
+        }
+        df_sorted = self._project(df_sorted, columns).rename(columns={'hexqueryid': 'query_id'})
+        
+        df_sorted['query_preview'], df_sorted['query_preview_suffix'] = self._query_previews(df_sorted['query_id'], 50)
+        
+        # Конвертируем в GB и округляем
+        wal_mb = df_sorted['wal_mb']
+        df_sorted['wal_mb'] = wal_mb.round(2)
+        df_sorted['wal_gb'] = np.where(wal_mb > 1024, (wal_mb / 1024).round(3), 0)
+        df_sorted['wal_pct'] = df_sorted['wal_bytes_pct'].fillna(0).round(2)
+        df_sorted['calls_str'] = format_count_column(df_sorted['calls'])
+        
+        return df_sorted[[
+            'query_id', 'query_preview', 'query_preview_suffix', 'dbname', 'calls',
+            'wal_bytes', 'wal_mb', 'wal_gb', 'wal_pct', 'calls_str',
+        ]].to_dict(orient='records')
     
+    @memoize_result
     def analyze_wal_stats(self):
         """Анализирует статистику WAL"""
-        df = self.sheets.get('wal_stats', pd.DataFrame())
-        if df.empty:
+        row = self._read_first_row('wal_stats')
+        if not row:
             return {}
         
-        row = df.iloc[0]
-        
         wal_records = row.get('wal_records', 0)
         wal_fpi = row.get('wal_fpi', 0)
         wal_bytes = row.get('wal_bytes', 0)
@@ -255,84 +818,110 @@ class PostgresAnalyzer:
             'sync_time': wal_sync_time
         }
     
+    @memoize_result
     def analyze_tables(self, top_n=10):
         """Анализирует статистику таблиц"""
         df = self.sheets.get('top_tables', pd.DataFrame())
         if df.empty:
             return []
         
-        results = []
+        columns = {
+            'dbname': 'N/A',
+            'schemaname': 'N/A',
+            'relname': 'N/A',
+            'n_live_tup': 0,
+            'n_dead_tup': 0,
+            'n_mod_since_analyze': 0,
+            'seq_scan': 0,
+            'idx_scan': 0,
+            'relsize': 'N/A',
+        }
+        df = self._project(df, columns)
         
-        for _, row in df.iterrows():
-            dbname = row.get('dbname', 'N/A')
-            schemaname = row.get('schemaname', 'N/A')
-            relname = row.get('relname', 'N/A')
-            
-            n_live_tup = row.get('n_live_tup', 0)
-            n_dead_tup = row.get('n_dead_tup', 0)
-            n_mod_since_analyze = row.get('n_mod_since_analyze', 0)
-            
-            seq_scan = row.get('seq_scan', 0)
-            idx_scan = row.get('idx_scan', 0)
-            
-            relsize = row.get('relsize', 'N/A')
-            
-            # Проблемы
-            issues = []
-            
-            # Bloat проблема
-            if n_live_tup > 0:
-                dead_ratio = (n_dead_tup / n_live_tup * 100)
-                if dead_ratio > 20:
-                    issues.append(f"⚠️ Много мертвых строк: {dead_ratio:.1f}% ({n_dead_tup:,})")
-            
-            # Проблема с ANALYZE
-            if n_live_tup > 0 and n_mod_since_analyze > n_live_tup * 0.2:
-                issues.append(f"⚠️ Нужен ANALYZE: {n_mod_since_analyze:,} изменений")
-            
-            # Seq scan на больших таблицах
-            if seq_scan > 100 and n_live_tup > 10000:
-                issues.append(f"⚠️ Много seq_scan: {seq_scan} (возможно нужен индекс)")
-            
-            if issues:  # Добавляем только проблемные таблицы
-                results.append({
-                    'dbname': dbname,
-                    'schema': schemaname,
-                    'table': relname,
-                    'size': relsize,
-                    'live_tuples': n_live_tup,
-                    'dead_tuples': n_dead_tup,
-                    'seq_scan': seq_scan,
-                    'idx_scan': idx_scan,
-                    'mod_since_analyze': n_mod_since_analyze,
-                    'issues': issues
-                })
-        
-        return sorted(results, key=lambda x: len(x['issues']), reverse=True)[:top_n]
+        live = df['n_live_tup']
+        has_live = live > 0
+        dead_ratio = df['n_dead_tup'] / live.where(has_live) * 100
+        
+        # Bloat проблема
+        bloated = has_live & (dead_ratio > 20)
+        # Проблема с ANALYZE
+        needs_analyze = has_live & (df['n_mod_since_analyze'] > live * 0.2)
+        # Seq scan на больших таблицах
+        many_seq_scans = (df['seq_scan'] > 100) & (live > 10000)
+        
+        df = df.assign(
+            dead_ratio=dead_ratio,
+            bloated=bloated,
+            needs_analyze=needs_analyze,
+            many_seq_scans=many_seq_scans,
+            issue_count=bloated.astype(int) + needs_analyze.astype(int) + many_seq_scans.astype(int),
+        )
+        
+        # Оставляем только проблемные таблицы; при равном числе проблем сохраняется исходный порядок
+        df = df[df['issue_count'] > 0].nlargest(top_n, 'issue_count', keep='first')
+        
+        # Тексты проблем формируются только для отобранных таблиц
+        issues = []
+        for (is_bloated, is_stale, is_seq, ratio, n_dead_tup, n_mod_since_analyze, seq_scan) in df[[
+                'bloated', 'needs_analyze', 'many_seq_scans', 'dead_ratio',
+                'n_dead_tup', 'n_mod_since_analyze', 'seq_scan']].itertuples(index=False, name=None):
+            table_issues = []
+            if is_bloated:
+                table_issues.append(f"⚠️ Много мертвых строк: {ratio:.1f}% ({n_dead_tup:,})")
+            if is_stale:
+                table_issues.append(f"⚠️ Нужен ANALYZE: {n_mod_since_analyze:,} изменений")
+            if is_seq:
+                table_issues.append(f"⚠️ Много seq_scan: {seq_scan} (возможно нужен индекс)")
+            issues.append(table_issues)
+        df['issues'] = issues
+        
+        # Строковые представления счетчиков для отчета
+        for col in ['n_live_tup', 'n_dead_tup', 'seq_scan', 'idx_scan', 'n_mod_since_analyze']:
+            df[f'{col}_str'] = format_count_column(df[col])
+        
+        return df.rename(columns={
+            'schemaname': 'schema',
+            'relname': 'table',
+            'relsize': 'size',
+            'n_live_tup': 'live_tuples',
+            'n_dead_tup': 'dead_tuples',
+            'n_mod_since_analyze': 'mod_since_analyze',
+            'n_live_tup_str': 'live_tuples_str',
+            'n_dead_tup_str': 'dead_tuples_str',
+            'n_mod_since_analyze_str': 'mod_since_analyze_str',
+        })[[
+            'dbname', 'schema', 'table', 'size', 'live_tuples', 'dead_tuples',
+            'seq_scan', 'idx_scan', 'mod_since_analyze', 'issues',
+            'live_tuples_str', 'dead_tuples_str', 'seq_scan_str', 'idx_scan_str', 'mod_since_analyze_str',
+        ]].to_dict(orient='records')
     
+    @memoize_result
     def analyze_indexes(self):
         """Анализирует использование индексов"""
         df = self.sheets.get('top_indexes', pd.DataFrame())
         if df.empty:
             return []
         
-        results = []
+        columns = {
+            'dbname': 'N/A',
+            'schemaname': 'N/A',
+            'relname': 'N/A',
+            'indexrelname': 'N/A',
+            'indexrelsize': 'N/A',
+            'idx_scan': 0,
+        }
+        df = self._project(df, columns)
         
-        for _, row in df.iterrows():
-            idx_scan = row.get('idx_scan', 0)
-            
-            # Ищем неиспользуемые индексы
-            if idx_scan == 0:
-                results.append({
-                    'dbname': row.get('dbname', 'N/A'),
-                    'schema': row.get('schemaname', 'N/A'),
-                    'table': row.get('relname', 'N/A'),
-                    'index': row.get('indexrelname', 'N/A'),
-                    'size': row.get('indexrelsize', 'N/A'),
-                    'scans': idx_scan
-                })
-        
-        return results
+        # Ищем неиспользуемые индексы
+        unused = df[df['idx_scan'] == 0].rename(columns={
+            'schemaname': 'schema',
+            'relname': 'table',
+            'indexrelname': 'index',
+            'indexrelsize': 'size',
+            'idx_scan': 'scans',
+        })
+        
+        return unused.to_dict(orient='records')
     
     def generate_markdown_report(self, output_file):
         """Генерирует Markdown отчет"""
@@ -346,277 +935,270 @@ class PostgresAnalyzer:
         problem_tables = self.analyze_tables(10)
         unused_indexes = self.analyze_indexes()
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            # Заголовок
-            f.write("# 📊 Анализ производительности PostgreSQL\n\n")
-            f.write(f"**Дата анализа**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+        if self.sheets.load_log:
+            print("Загружены листы:\n" + "\n".join(self.sheets.load_log))
+        
+        # Отчет собирается в список строк и записывается в файл одним вызовом
+        out = []
+        
+        # Заголовок
+        out.append("# 📊 Анализ производительности PostgreSQL\n\n")
+        out.append(f"**Дата анализа**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+        
+        # Период отчета
+        out.append("## ⏱️ Период мониторинга\n\n")
+        out.append(f"- **Начало**: `{start}`\n")
+        out.append(f"- **Конец**: `{end}`\n")
+        out.append(f"- **Длительность**: {duration} минут\n\n")
+        
+        out.append("---\n\n")
+        
+        # Общая статистика БД
+        out.append("## 🗄️ Общая статистика баз данных\n\n")
+        
+        for db in db_stats:
+            out.append(f"### База данных: `{db['dbname']}`\n\n")
+            out.append(markdown_table([
+                ("**Размер БД**", db['size_str']),
+                ("**Изменение размера**", db['size_delta_str']),
+                ("**Cache Hit Ratio**", f"{db['cache_hit_ratio']:.2f}%"),
+                ("**Commits**", db['commits_str']),
+                ("**Rollbacks**", f"{db['rollbacks_str']} {db['rollback_ratio_str']}"),
+                ("**Deadlocks**", db['deadlocks_str']),
+                ("**Временные файлы**", db['temp_files_str']),
+            ], ["Метрика", "Значение"]))
+            out.append("\n")
             
-            # Период отчета
-            f.write("## ⏱️ Период мониторинга\n\n")
-            f.write(f"- **Начало**: `{start}`\n")
-            f.write(f"- **Конец**: `{end}`\n")
-            f.write(f"- **Длительность**: {duration} минут\n\n")
+            if db['issues']:
+                out.append("**⚠️ Обнаруженные проблемы:**\n\n")
+                for issue in db['issues']:
+                    out.append(f"- {issue}\n")
+                out.append("\n")
+            else:
+                out.append("✅ **Проблем не обнаружено**\n\n")
+        
+        out.append("---\n\n")
+        
+        # WAL статистика
+        out.append("## 📝 Статистика Write-Ahead Log (WAL)\n\n")
+        
+        if wal_stats:
+            out.append(markdown_table([
+                ("**Количество записей**", f"{wal_stats['records']:,}"),
+                ("**Full Page Images**", f"{wal_stats['fpi']:,}"),
+                ("**Объем WAL**", f"{wal_stats['size_mb']:.2f} MB ({wal_stats['size_gb']:.3f} GB)"),
+                ("**Время записи**", f"{wal_stats['write_time']:.2f} мс"),
+                ("**Время синхронизации**", f"{wal_stats['sync_time']:.2f} мс"),
+            ], ["Метрика", "Значение"]))
+            out.append("\n")
             
-            f.write("---\n\n")
+            # Анализ
+            wal_per_min = wal_stats['size_mb'] / duration if duration > 0 else 0
+            out.append(f"**Скорость генерации WAL**: {wal_per_min:.2f} MB/мин\n\n")
             
-            # Общая статистика БД
-            f.write("## 🗄️ Общая статистика баз данных\n\n")
+            if wal_per_min > 100:
+                out.append("⚠️ **Высокая скорость генерации WAL** - возможно много операций записи\n\n")
+            elif wal_per_min > 50:
+                out.append("⚡ **Умеренная активность записи**\n\n")
+            else:
+                out.append("✅ **Нормальная активность записи**\n\n")
+        else:
+            out.append("*Данные недоступны*\n\n")
+        
+        # Топ запросов по генерации WAL
+        if top_wal_queries:
+            out.append("### 📊 Топ-5 запросов по генерации WAL\n\n")
+            out.append("*Запросы с наибольшим объемом Write-Ahead Log*\n\n")
             
-            for db in db_stats:
-                f.write(f"### База данных: `{db['dbname']}`\n\n")
-                f.write(f"| Метрика | Значение |\n")
-                f.write(f"|---------|----------|\n")
+            for i, query in enumerate(top_wal_queries, 1):
+                out.append(f"**{i}. Query ID:** `{query['query_id']}`\n\n")
+                out.append(f"- **SQL Preview:** `{query['query_preview']}{query['query_preview_suffix']}`\n")
+                out.append(f"- **База данных:** {query['dbname']}\n")
+                out.append(f"- **Количество вызовов:** {query['calls_str']}\n")
+                out.append(f"- **Объем WAL:** {query['wal_mb']:.2f} MB")
                 
-                # Форматируем все значения, заменяя nan на пустую строку
-                size_str = '' if pd.isna(db['size']) else str(db['size'])
-                size_delta_str = '' if pd.isna(db['size_delta']) else str(db['size_delta'])
-                commits_str = f"{int(db['commits']):,}" if pd.notna(db['commits']) else ''
-                rollbacks_str = f"{int(db['rollbacks']):,}" if pd.notna(db['rollbacks']) else ''
-                rollback_ratio_str = f"({db['rollback_ratio']:.2f}%)" if pd.notna(db['rollback_ratio']) and rollbacks_str else ''
-                deadlocks_str = '' if pd.isna(db['deadlocks']) or db['deadlocks'] == 0 else str(int(db['deadlocks']))
-                temp_files_str = '' if pd.isna(db['temp_files']) or db['temp_files'] == 0 else str(int(db['temp_files']))
+                if query['wal_pct'] > 0:
+                    out.append(f" — {query['wal_pct']:.1f}% от общего WAL")
                 
-                f.write(f"| **Размер БД** | {size_str} |\n")
-                f.write(f"| **Изменение размера** | {size_delta_str} |\n")
-                f.write(f"| **Cache Hit Ratio** | {db['cache_hit_ratio']:.2f}% |\n")
-                f.write(f"| **Commits** | {commits_str} |\n")
-                f.write(f"| **Rollbacks** | {rollbacks_str} {rollback_ratio_str} |\n")
-                f.write(f"| **Deadlocks** | {deadlocks_str} |\n")
-                f.write(f"| **Временные файлы** | {temp_files_str} |\n\n")
-                
-                if db['issues']:
-                    f.write("**⚠️ Обнаруженные проблемы:**\n\n")
-                    for issue in db['issues']:
-                        f.write(f"- {issue}\n")
-                    f.write("\n")
-                else:
-                    f.write("✅ **Проблем не обнаружено**\n\n")
+                out.append("\n\n")
             
-            f.write("---\n\n")
-            
-            # WAL статистика
-            f.write("## 📝 Статистика Write-Ahead Log (WAL)\n\n")
+            out.append("\n")
+        
+        out.append("---\n\n")
+        
+        # Топ тяжелых запросов
+        out.append("## 🔥 Топ самых тяжелых запросов\n\n")
+        
+        if top_queries:
+            out.append(f"*Анализ {len(top_queries)} запросов с наибольшим временем выполнения*\n\n")
             
-            if wal_stats:
-                f.write(f"| Метрика | Значение |\n")
-                f.write(f"|---------|----------|\n")
-                f.write(f"| **Количество записей** | {wal_stats['records']:,} |\n")
-                f.write(f"| **Full Page Images** | {wal_stats['fpi']:,} |\n")
-                f.write(f"| **Объем WAL** | {wal_stats['size_mb']:.2f} MB ({wal_stats['size_gb']:.3f} GB) |\n")
-                f.write(f"| **Время записи** | {wal_stats['write_time']:.2f} мс |\n")
-                f.write(f"| **Время синхронизации** | {wal_stats['sync_time']:.2f} мс |\n\n")
+            for i, query in enumerate(top_queries, 1):
+                out.append(f"### {i}. Query ID: `{query['query_id']}`\n\n")
+                out.append(f"**SQL Preview:** `{query['query_preview']}{query['query_preview_suffix']}`\n\n")
+                query_rows = [
+                    ("**База данных**", query['dbname']),
+                    ("**Пользователь**", query['username']),
+                    ("**Количество вызовов**", query['calls_str']),
+                    ("**Общее время выполнения**", f"{query['total_time']*1000:.0f} мс"),
+                    ("**Среднее время**", f"{query['mean_time']:.2f} мс"),
+                    ("**Количество строк**", query['rows_str']),
+                    ("**Cache Hit Ratio**", f"{query['cache_ratio']:.1f}%"),
+                ]
+                if query['temp_blks'] > 0:
+                    query_rows.append(("**Временные блоки**", query['temp_blks_str']))
                 
-                # Анализ
-                wal_per_min = wal_stats['size_mb'] / duration if duration > 0 else 0
-                f.write(f"**Скорость генерации WAL**: {wal_per_min:.2f} MB/мин\n\n")
+                out.append(markdown_table(query_rows, ["Параметр", "Значение"]))
+                out.append("\n")
                 
-                if wal_per_min > 100:
-                    f.write("⚠️ **Высокая скорость генерации WAL** - возможно много операций записи\n\n")
-                elif wal_per_min > 50:
-                    f.write("⚡ **Умеренная активность записи**\n\n")
+                if query['issues']:
+                    out.append("**⚠️ Проблемы:**\n\n")
+                    for issue in query['issues']:
+                        out.append(f"- {issue}\n")
+                    out.append("\n")
                 else:
-                    f.write("✅ **Нормальная активность записи**\n\n")
-            else:
-                f.write("*Данные недоступны*\n\n")
-            
-            # Топ запросов по генерации WAL
-            if top_wal_queries:
-                f.write("### 📊 Топ-5 запросов по генерации WAL\n\n")
-                f.write("*Запросы с наибольшим объемом Write-Ahead Log*\n\n")
+                    out.append("✅ **Запрос работает нормально**\n\n")
                 
-                for i, query in enumerate(top_wal_queries, 1):
-                    f.write(f"**{i}. Query ID:** `{query['query_id']}`\n\n")
-                    f.write(f"- **SQL Preview:** `{query['query_preview']}{query['query_preview_suffix']}`\n")
-                    f.write(f"- **База данных:** {query['dbname']}\n")
-                    f.write(f"- **Количество вызовов:** {query['calls']:,}\n")
-                    f.write(f"- **Объем WAL:** {query['wal_mb']:.2f} MB")
-                    
-                    if query['wal_pct'] > 0:
-                        f.write(f" — {query['wal_pct']:.1f}% от общего WAL")
-                    
-                    f.write("\n\n")
-                
-                f.write("\n")
-            
-            f.write("---\n\n")
-            
-            # Топ тяжелых запросов
-            f.write("## 🔥 Топ самых тяжелых запросов\n\n")
-            
-            if top_queries:
-                f.write(f"*Анализ {len(top_queries)} запросов с наибольшим временем выполнения*\n\n")
+                # Рекомендации
+                recommendations = []
+                if query['mean_time'] > 1000:
+                    recommendations.append("Рассмотреть оптимизацию запроса или добавление индексов")
+                if query['temp_blks'] > 0:
+                    recommendations.append("Увеличить `work_mem` для избежания использования временных файлов")
+                if query['cache_ratio'] < 90:
+                    recommendations.append("Проверить индексы и статистику таблиц")
                 
-                for i, query in enumerate(top_queries, 1):
-                    f.write(f"### {i}. Query ID: `{query['query_id']}`\n\n")
-                    f.write(f"**SQL Preview:** `{query['query_preview']}{query['query_preview_suffix']}`\n\n")
-                    f.write(f"| Параметр | Значение |\n")
-                    f.write(f"|----------|----------|\n")
-                    f.write(f"| **База данных** | {query['dbname']} |\n")
-                    f.write(f"| **Пользователь** | {query['username']} |\n")
-                    f.write(f"| **Количество вызовов** | {query['calls']:,} |\n")
-                    f.write(f"| **Общее время выполнения** | {query['total_time']*1000:.0f} мс |\n")
-                    f.write(f"| **Среднее время** | {query['mean_time']:.2f} мс |\n")
-                    
-                    # Форматируем количество строк с проверкой на NaN
-                    rows_value = query['rows']
-                    rows_str = f"{int(rows_value):,}" if pd.notna(rows_value) and rows_value > 0 else ""
-                    f.write(f"| **Количество строк** | {rows_str} |\n")
-                    
-                    f.write(f"| **Cache Hit Ratio** | {query['cache_ratio']:.1f}% |\n")
-                    
-                    if query['temp_blks'] > 0:
-                        f.write(f"| **Временные блоки** | {query['temp_blks']:,} |\n")
-                    
-                    f.write("\n")
-                    
-                    if query['issues']:
-                        f.write("**⚠️ Проблемы:**\n\n")
-                        for issue in query['issues']:
-                            f.write(f"- {issue}\n")
-                        f.write("\n")
-                    else:
-                        f.write("✅ **Запрос работает нормально**\n\n")
-                    
-                    # Рекомендации
-                    recommendations = []
-                    if query['mean_time'] > 1000:
-                        recommendations.append("Рассмотреть оптимизацию запроса или добавление индексов")
-                    if query['temp_blks'] > 0:
-                        recommendations.append("Увеличить `work_mem` для избежания использования временных файлов")
-                    if query['cache_ratio'] < 90:
-                        recommendations.append("Проверить индексы и статистику таблиц")
-                    
-                    if recommendations:
-                        f.write("**💡 Рекомендации:**\n\n")
-                        for rec in recommendations:
-                            f.write(f"- {rec}\n")
-                        f.write("\n")
-                    
-                    f.write("---\n\n")
-            else:
-                f.write("*Данные о запросах недоступны*\n\n")
-            
-            # Проблемные таблицы
-            if problem_tables:
-                f.write("## 🗂️ Таблицы требующие внимания\n\n")
+                if recommendations:
+                    out.append("**💡 Рекомендации:**\n\n")
+                    for rec in recommendations:
+                        out.append(f"- {rec}\n")
+                    out.append("\n")
                 
-                for i, table in enumerate(problem_tables, 1):
-                    f.write(f"### {i}. `{table['schema']}.{table['table']}`\n\n")
-                    f.write(f"| Параметр | Значение |\n")
-                    f.write(f"|----------|----------|\n")
-                    f.write(f"| **База данных** | {table['dbname']} |\n")
-                    f.write(f"| **Размер** | {table['size']} |\n")
-                    f.write(f"| **Живых строк** | {table['live_tuples']:,} |\n")
-                    f.write(f"| **Мертвых строк** | {table['dead_tuples']:,} |\n")
-                    f.write(f"| **Seq Scan** | {table['seq_scan']:,} |\n")
-                    f.write(f"| **Index Scan** | {table['idx_scan']:,} |\n")
-                    f.write(f"| **Изменений с ANALYZE** | {table['mod_since_analyze']:,} |\n\n")
-                    
-                    f.write("**⚠️ Проблемы:**\n\n")
-                    for issue in table['issues']:
-                        f.write(f"- {issue}\n")
-                    f.write("\n")
-                    
-                    # Рекомендации
-                    f.write("**💡 Рекомендации:**\n\n")
-                    if table['dead_tuples'] > table['live_tuples'] * 0.2:
-                        f.write(f"- Выполнить `VACUUM ANALYZE {table['schema']}.{table['table']};`\n")
-                    if table['mod_since_analyze'] > table['live_tuples'] * 0.2:
-                        f.write(f"- Выполнить `ANALYZE {table['schema']}.{table['table']};`\n")
-                    if table['seq_scan'] > 100 and table['live_tuples'] > 10000:
-                        f.write(f"- Рассмотреть создание индекса для частых запросов\n")
-                    f.write("\n")
-                    
-                    f.write("---\n\n")
+                out.append("---\n\n")
+        else:
+            out.append("*Данные о запросах недоступны*\n\n")
+        
+        # Проблемные таблицы
+        if problem_tables:
+            out.append("## 🗂️ Таблицы требующие внимания\n\n")
             
-            # Неиспользуемые индексы
-            if unused_indexes:
-                f.write("## 🔍 Неиспользуемые индексы\n\n")
-                f.write("*Индексы, которые не использовались за период мониторинга*\n\n")
+            for i, table in enumerate(problem_tables, 1):
+                out.append(f"### {i}. `{table['schema']}.{table['table']}`\n\n")
+                out.append(markdown_table([
+                    ("**База данных**", table['dbname']),
+                    ("**Размер**", table['size']),
+                    ("**Живых строк**", table['live_tuples_str']),
+                    ("**Мертвых строк**", table['dead_tuples_str']),
+                    ("**Seq Scan**", table['seq_scan_str']),
+                    ("**Index Scan**", table['idx_scan_str']),
+                    ("**Изменений с ANALYZE**", table['mod_since_analyze_str']),
+                ], ["Параметр", "Значение"]))
+                out.append("\n")
                 
-                f.write("| База данных | Схема | Таблица | Индекс | Размер |\n")
-                f.write("|-------------|-------|---------|--------|--------|\n")
+                out.append("**⚠️ Проблемы:**\n\n")
+                for issue in table['issues']:
+                    out.append(f"- {issue}\n")
+                out.append("\n")
                 
-                for idx in unused_indexes[:10]:
-                    f.write(f"| {idx['dbname']} | {idx['schema']} | {idx['table']} | {idx['index']} | {idx['size']} |\n")
+                # Рекомендации
+                out.append("**💡 Рекомендации:**\n\n")
+                if table['dead_tuples'] > table['live_tuples'] * 0.2:
+                    out.append(f"- Выполнить `VACUUM ANALYZE {table['schema']}.{table['table']};`\n")
+                if table['mod_since_analyze'] > table['live_tuples'] * 0.2:
+                    out.append(f"- Выполнить `ANALYZE {table['schema']}.{table['table']};`\n")
+                if table['seq_scan'] > 100 and table['live_tuples'] > 10000:
+                    out.append(f"- Рассмотреть создание индекса для частых запросов\n")
+                out.append("\n")
                 
-                f.write("\n**💡 Рекомендация**: Рассмотреть удаление неиспользуемых индексов для экономии места и улучшения производительности INSERT/UPDATE операций.\n\n")
-                f.write("```sql\n")
-                f.write("-- Проверьте использование индекса перед удалением:\n")
-                for idx in unused_indexes[:3]:
-                    f.write(f"DROP INDEX IF EXISTS {idx['schema']}.{idx['index']};\n")
-                f.write("```\n\n")
-                f.write("---\n\n")
-            
-            # Общие выводы и рекомендации
-            f.write("## 📋 Общие выводы и рекомендации\n\n")
-            
-            f.write("### ✅ Что работает хорошо\n\n")
-            
-            good_things = []
-            for db in db_stats:
-                if db['cache_hit_ratio'] >= 95:
-                    good_things.append(f"Отличный cache hit ratio в БД `{db['dbname']}`: {db['cache_hit_ratio']:.2f}%")
-                if db['deadlocks'] == 0:
-                    good_things.append(f"Нет deadlocks в БД `{db['dbname']}`")
-            
-            if not good_things:
-                good_things.append("База работает в целом стабильно")
-            
-            for item in good_things:
-                f.write(f"- {item}\n")
-            
-            f.write("\n### ⚠️ Критические проблемы\n\n")
-            
-            critical = []
-            for db in db_stats:
-                if db['cache_hit_ratio'] < 90:
-                    critical.append(f"**Очень низкий cache hit ratio** в `{db['dbname']}`: {db['cache_hit_ratio']:.2f}% - нужно увеличить `shared_buffers`")
-                if db['deadlocks'] and db['deadlocks'] > 0:
-                    critical.append(f"**Deadlocks** в `{db['dbname']}`: {db['deadlocks']} - проверить логику приложения")
-            
-            if not critical:
-                f.write("- Критических проблем не обнаружено ✅\n")
-            else:
-                for item in critical:
-                    f.write(f"- {item}\n")
-            
-            f.write("\n### 💡 Рекомендации по оптимизации\n\n")
-            
-            recommendations = []
-            
-            # Анализ для рекомендаций
-            for db in db_stats:
-                if db['temp_files'] and db['temp_files'] > 0:
-                    recommendations.append("**Увеличить work_mem** - обнаружено использование временных файлов")
-                if 90 <= db['cache_hit_ratio'] < 95:
-                    recommendations.append(f"**Рассмотреть увеличение shared_buffers** - cache hit ratio {db['cache_hit_ratio']:.2f}% можно улучшить")
-            
-            if problem_tables:
-                recommendations.append("**Настроить autovacuum** - обнаружены таблицы с большим количеством мертвых строк")
-            
-            if unused_indexes:
-                recommendations.append(f"**Удалить {len(unused_indexes)} неиспользуемых индексов** - освободит место и ускорит операции записи")
-            
-            heavy_queries = [q for q in top_queries if q['mean_time'] > 1000]
-            if heavy_queries:
-                recommendations.append(f"**Оптимизировать {len(heavy_queries)} медленных запросов**")
-            
-            if not recommendations:
-                recommendations.append("База данных настроена хорошо, критических рекомендаций нет")
-            
-            for i, rec in enumerate(recommendations, 1):
-                f.write(f"{i}. {rec}\n")
+                out.append("---\n\n")
+        
+        # Неиспользуемые индексы
+        if unused_indexes:
+            out.append("## 🔍 Неиспользуемые индексы\n\n")
+            out.append("*Индексы, которые не использовались за период мониторинга*\n\n")
             
-            f.write("\n---\n\n")
+            out.append(markdown_table(
+                [(idx['dbname'], idx['schema'], idx['table'], idx['index'], idx['size']) for idx in unused_indexes[:10]],
+                ["База данных", "Схема", "Таблица", "Индекс", "Размер"]))
             
-            # Футер
-            f.write("## 📚 Дополнительная информация\n\n")
-            f.write("**Источник данных**: `report--postgres-8360-8361.xlsx`\n\n")
-            f.write("**Инструменты анализа**: Python, pandas, openpyxl\n\n")
-            f.write("**Методология**: Анализ включает оценку производительности запросов, ")
-            f.write("использования индексов, статистики таблиц, WAL активности и общего здоровья БД.\n\n")
-            f.write(f"*Отчет сгенерирован автоматически {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*\n")
+            out.append("\n**💡 Рекомендация**: Рассмотреть удаление неиспользуемых индексов для экономии места и улучшения производительности INSERT/UPDATE операций.\n\n")
+            out.append("```sql\n")
+            out.append("-- Проверьте использование индекса перед удалением:\n")
+            for idx in unused_indexes[:3]:
+                out.append(f"DROP INDEX IF EXISTS {idx['schema']}.{idx['index']};\n")
+            out.append("```\n\n")
+            out.append("---\n\n")
+        
+        # Общие выводы и рекомендации
+        out.append("## 📋 Общие выводы и рекомендации\n\n")
+        
+        out.append("### ✅ Что работает хорошо\n\n")
+        
+        good_things = []
+        for db in db_stats:
+            if db['cache_hit_ratio'] >= 95:
+                good_things.append(f"Отличный cache hit ratio в БД `{db['dbname']}`: {db['cache_hit_ratio']:.2f}%")
+            if db['deadlocks'] == 0:
+                good_things.append(f"Нет deadlocks в БД `{db['dbname']}`")
+        
+        if not good_things:
+            good_things.append("База работает в целом стабильно")
+        
+        for item in good_things:
+            out.append(f"- {item}\n")
+        
+        out.append("\n### ⚠️ Критические проблемы\n\n")
+        
+        critical = []
+        for db in db_stats:
+            if db['cache_hit_ratio'] < 90:
+                critical.append(f"**Очень низкий cache hit ratio** в `{db['dbname']}`: {db['cache_hit_ratio']:.2f}% - нужно увеличить `shared_buffers`")
+            if db['deadlocks'] and db['deadlocks'] > 0:
+                critical.append(f"**Deadlocks** в `{db['dbname']}`: {db['deadlocks']} - проверить логику приложения")
+        
+        if not critical:
+            out.append("- Критических проблем не обнаружено ✅\n")
+        else:
+            for item in critical:
+                out.append(f"- {item}\n")
+        
+        out.append("\n### 💡 Рекомендации по оптимизации\n\n")
+        
+        recommendations = []
+        
+        # Анализ для рекомендаций
+        for db in db_stats:
+            if db['temp_files'] and db['temp_files'] > 0:
+                recommendations.append("**Увеличить work_mem** - обнаружено использование временных файлов")
+            if 90 <= db['cache_hit_ratio'] < 95:
+                recommendations.append(f"**Рассмотреть увеличение shared_buffers** - cache hit ratio {db['cache_hit_ratio']:.2f}% можно улучшить")
+        
+        if problem_tables:
+            recommendations.append("**Настроить autovacuum** - обнаружены таблицы с большим количеством мертвых строк")
+        
+        if unused_indexes:
+            recommendations.append(f"**Удалить {len(unused_indexes)} неиспользуемых индексов** - освободит место и ускорит операции записи")
+        
+        heavy_queries = [q for q in top_queries if q['mean_time'] > 1000]
+        if heavy_queries:
+            recommendations.append(f"**Оптимизировать {len(heavy_queries)} медленных запросов**")
+        
+        if not recommendations:
+            recommendations.append("База данных настроена хорошо, критических рекомендаций нет")
+        
+        for i, rec in enumerate(recommendations, 1):
+            out.append(f"{i}. {rec}\n")
+        
+        out.append("\n---\n\n")
+        
+        # Футер
+        out.append("## 📚 Дополнительная информация\n\n")
+        out.append("**Источник данных**: `report--postgres-8360-8361.xlsx`\n\n")
+        out.append("**Инструменты анализа**: Python, pandas, openpyxl\n\n")
+        out.append("**Методология**: Анализ включает оценку производительности запросов, ")
+        out.append("использования индексов, статистики таблиц, WAL активности и общего здоровья БД.\n\n")
+        out.append(f"*Отчет сгенерирован автоматически {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*\n")
+        
+        Path(output_file).write_text("".join(out), encoding='utf-8')
         
         print(f"✓ Отчет успешно сохранен в {output_file}")
 
@@ -640,7 +1222,10 @@ def process_excel_file(excel_file_path):
     
     try:
         analyzer = PostgresAnalyzer(excel_file)
-        analyzer.generate_markdown_report(output_file)
+        try:
+            analyzer.generate_markdown_report(output_file)
+        finally:
+            analyzer.close()
         
         print()
         print("=" * 70)
@@ -658,6 +1243,75 @@ def process_excel_file(excel_file_path):
         return False
 
 
+def scan_directory(directory, name_pattern):
+    """
+    Находит файлы одного каталога по маске имени (например, reports/*.xlsx)
+    за один проход os.scandir
+    
+    Args:
+        directory: каталог ('' - текущий)
+        name_pattern: маска имени файла
+        
+    Returns:
+        list: пути найденных файлов
+    """
+    try:
+        with os.scandir(directory or '.') as entries:
+            names = [entry.name for entry in entries if entry.is_file()]
+    except OSError:
+        return []
+    
+    # Скрытые файлы, как и в glob, совпадают только с маской, начинающейся с точки
+    if not name_pattern.startswith('.'):
+        names = [name for name in names if not name.startswith('.')]
+    
+    return [os.path.join(directory, name) for name in fnmatch.filter(names, name_pattern)]
+
+
+def expand_file_patterns(file_patterns):
+    """
+    Раскрывает пути и маски Excel файлов из командной строки
+    
+    Args:
+        file_patterns: список путей или масок (*.xlsx, ?, [seq], ** для подпапок)
+        
+    Returns:
+        list: список файлов без повторов
+    """
+    files = []
+    
+    # Один и тот же файл может совпасть с несколькими паттернами - обрабатываем его один раз
+    seen_paths = set()
+    
+    for file_pattern in file_patterns:
+        directory, name_pattern = os.path.split(file_pattern)
+        
+        if ('**' not in file_pattern
+                and not any(char in directory for char in '*?[')
+                and any(char in name_pattern for char in '*?[')):
+            # Простая маска в одном каталоге - достаточно одного прохода os.scandir
+            matched_files = scan_directory(directory, name_pattern)
+        else:
+            # glob сам обрабатывает и обычные пути, и сложные маски
+            matched_files = list(glob.iglob(file_pattern, recursive=True))
+        
+        if not matched_files and os.path.exists(file_pattern):
+            # Имя существующего файла само содержит символы маски (например, 'report[1].xlsx')
+            matched_files = [file_pattern]
+        
+        if not matched_files:
+            print(f"⚠️ Предупреждение: паттерн '{file_pattern}' не совпал ни с одним файлом")
+            continue
+        
+        for file_path in matched_files:
+            real_path = os.path.realpath(file_path)
+            if real_path not in seen_paths:
+                seen_paths.add(real_path)
+                files.append(file_path)
+    
+    return files
+
+
 def main():
     """Основная функция"""
     # Парсинг аргументов командной строки
@@ -670,6 +1324,7 @@ def main():
   %(prog)s report.xlsx               # Проанализировать один файл
   %(prog)s *.xlsx                    # Проанализировать все Excel файлы в папке
   %(prog)s "20 RPS.xlsx" "40 RPS.xlsx"  # Проанализировать несколько файлов
+  %(prog)s "reports/**/*.xlsx"       # Проанализировать файлы во всех подпапках
   %(prog)s C:/reports/*.xlsx         # Проанализировать файлы по пути с маской
         """
     )
@@ -680,25 +1335,20 @@ def main():
         help=f'Путь к Excel файлу(ам) или маска (*.xlsx). По умолчанию: {DEFAULT_EXCEL_FILE}'
     )
     
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Количество файлов, обрабатываемых параллельно. По умолчанию: число ядер CPU'
+    )
+    
     args = parser.parse_args()
     
     # Определяем список файлов для обработки
     files_to_process = []
     
     if args.files:
-        # Обрабатываем каждый аргумент
-        for file_pattern in args.files:
-            # Проверяем, содержит ли паттерн wildcards
-            if '*' in file_pattern or '?' in file_pattern:
-                # Используем glob для поиска файлов
-                matched_files = glob.glob(file_pattern)
-                if matched_files:
-                    files_to_process.extend(matched_files)
-                else:
-                    print(f"⚠️ Предупреждение: паттерн '{file_pattern}' не совпал ни с одним файлом")
-            else:
-                # Обычный файл
-                files_to_process.append(file_pattern)
+        files_to_process = expand_file_patterns(args.files)
     else:
         # Используем файл по умолчанию
         default_path = Path(__file__).parent / DEFAULT_EXCEL_FILE
@@ -719,8 +1369,16 @@ def main():
     success_count = 0
     failed_count = 0
     
-    for excel_file in files_to_process:
-        if process_excel_file(excel_file):
+    # Файлы независимы друг от друга, поэтому несколько файлов обрабатываются в отдельных процессах
+    jobs = max(1, min(args.jobs, len(files_to_process)))
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(process_excel_file, files_to_process))
+    else:
+        results = [process_excel_file(excel_file) for excel_file in files_to_process]
+    
+    for result in results:
+        if result:
             success_count += 1
         else:
             failed_count += 1
@@ -2,16 +2,38 @@
 Скрипт для парсинга HTML-отчета PostgreSQL и сохранения данных в Excel
 """
 
+import io
 import json
+import math
+import mmap
+import os
 import re
 import pandas as pd
-from bs4 import BeautifulSoup
 from pathlib import Path
 import argparse
+import fnmatch
 import glob
+from collections import deque
+from contextlib import contextmanager
+from copy import copy
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import PatternFill, Font
 from openpyxl.utils import get_column_letter
 
+try:
+    # orjson разбирает JSON в несколько раз быстрее стандартного модуля json
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # xlsxwriter быстрее и в режиме constant_memory не держит ячейки в памяти
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
 
 # Глобальные настройки
 DEFAULT_HTML_FILE = "20 RPS.html"  # Файл по умолчанию
@@ -21,156 +43,365 @@ HEADER_COLOR_RGB = (144, 238, 144)  # Цвет заголовков (светл
 ROW_COLOR_RGB = (240, 255, 240)     # Цвет строк данных (аквамарин)
 ENABLE_AUTOFILTER = True            # Включить автофильтр
 ENABLE_AUTOFIT_COLUMNS = True       # Автоматически растягивать столбцы
+AUTOFIT_SAMPLE_ROWS = 200           # Ширина столбцов считается по первым N строкам данных
+PREPARE_AHEAD = 1                   # Сколько наборов данных готовится заранее, пока пишется текущий лист
+
+# Нормализация вложенных JSON данных
+JSON_NORMALIZE_MAX_LEVEL = 2        # Глубина разворачивания вложенных объектов в столбцы
+# Пути к вложенным спискам записей для наборов данных известной структуры:
+# {'имя_набора': 'ключ' или ['ключ', 'вложенный_ключ']}. Наборы без записи разворачиваются целиком.
+DATASET_RECORD_PATHS = {}
+
+# Стили создаются один раз: одни и те же объекты переиспользуются во всех ячейках
+HEADER_HEX = '{:02X}{:02X}{:02X}'.format(*HEADER_COLOR_RGB)
+ROW_HEX = '{:02X}{:02X}{:02X}'.format(*ROW_COLOR_RGB)
+HEADER_FILL = PatternFill(start_color=HEADER_HEX, end_color=HEADER_HEX, fill_type='solid')
+ROW_FILL = PatternFill(start_color=ROW_HEX, end_color=ROW_HEX, fill_type='solid')
+BOLD_FONT = Font(bold=True)
+# Свойства форматов xlsxwriter (сами форматы привязаны к книге и создаются при записи)
+HEADER_FORMAT_PROPS = {'bold': True, 'bg_color': '#' + HEADER_HEX}
+ROW_FORMAT_PROPS = {'bg_color': '#' + ROW_HEX}
+
+# Декодер JSON (C-ускоритель модуля json), создается один раз на модуль
+JSON_DECODER = json.JSONDecoder()
 
 
-def extract_data_from_html(html_file_path):
+@contextmanager
+def open_html_content(html_file_path):
     """
-    Извлекает JSON данные из HTML файла
+    Открывает HTML файл как буфер байтов, отображенный в память (только чтение).
+    Один и тот же буфер используется всеми этапами разбора файла.
     
     Args:
         html_file_path: путь к HTML файлу
         
-    Returns:
-        dict: извлеченные данные
+    Yields:
+        mmap (или пустые bytes для пустого файла)
     """
     print(f"Читаю файл: {html_file_path}")
     
-    with open(html_file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
+    with open(html_file_path, 'rb') as f:
+        # Пустой файл нельзя отобразить в память
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+def extract_data_from_html(html_content):
+    """
+    Извлекает JSON данные из HTML
+    
+    Args:
+        html_content: содержимое HTML файла (bytes или mmap)
+        
+    Returns:
+        dict: извлеченные данные
+    """
+    start_marker = b'const data='
     
-    # Ищем начало данных: const data=
-    start_marker = 'const data='
-    start_idx = content.find(start_marker)
+    # Маркер ищется по байтам без декодирования всего HTML в строку
+    start_idx = html_content.find(start_marker)
     
     if start_idx == -1:
         raise ValueError("Не удалось найти 'const data=' в HTML файле")
     
-    # Начинаем парсинг с открывающей скобки
-    start_idx += len(start_marker)
-    
-    # Ищем конец JSON объекта с учетом вложенности скобок
-    brace_count = 0
-    in_string = False
-    escape_next = False
-    end_idx = start_idx
+    data_start = start_idx + len(start_marker)
+    data = None
     
-    for i in range(start_idx, len(content)):
-        char = content[i]
+    if orjson is not None:
+        # orjson разбирает байты без decode(), но требует точные границы JSON:
+        # берем содержимое до закрывающего </script> без завершающей ';'
+        script_end = html_content.find(b'</script>', data_start)
+        if script_end != -1:
+            payload = html_content[data_start:script_end].strip().rstrip(b';').rstrip()
+            try:
+                data = orjson.loads(payload)
+            except orjson.JSONDecodeError:
+                # После данных в том же <script> есть другой код - разбираем стандартным декодером
+                data = None
+    
+    if data is None:
+        # Декодируем только хвост файла, начиная с данных
+        content = html_content[data_start:].decode('utf-8')
         
-        if escape_next:
-            escape_next = False
-            continue
-            
-        if char == '\\':
-            escape_next = True
-            continue
-            
-        if char == '"' and not escape_next:
-            in_string = not in_string
-            continue
-            
-        if not in_string:
-            if char == '{':
-                brace_count += 1
-            elif char == '}':
-                brace_count -= 1
-                if brace_count == 0:
-                    end_idx = i + 1
-                    break
-    
-    data_str = content[start_idx:end_idx]
-    data = json.loads(data_str)
+        # raw_decode сам находит конец JSON объекта (с учетом вложенности и строк)
+        # и игнорирует следующий за ним JavaScript
+        json_start = len(content) - len(content.lstrip())
+        data, _ = JSON_DECODER.raw_decode(content, json_start)
     
     print(f"Найдено {len(data.get('datasets', {}))} наборов данных")
     
     return data
 
 
-def parse_tables_from_html(html_file_path):
+def parse_tables_from_html(html_content):
     """
-    Парсит таблицы из HTML с помощью BeautifulSoup
+    Парсит таблицы из HTML сразу в DataFrame (pd.read_html, парсер lxml)
     
     Args:
-        html_file_path: путь к HTML файлу
+        html_content: содержимое HTML файла (bytes или mmap)
         
     Returns:
         list: список DataFrame с таблицами
     """
-    print(f"Парсинг HTML таблиц из {html_file_path}")
+    print("Парсинг HTML таблиц")
     
-    with open(html_file_path, 'r', encoding='utf-8') as f:
-        soup = BeautifulSoup(f, 'html.parser')
+    # Пустой документ lxml не разбирает
+    if not len(html_content):
+        tables = []
+    else:
+        try:
+            # Срез превращает mmap в bytes (для bytes копирования не происходит)
+            tables = pd.read_html(io.BytesIO(html_content[:]), flavor='lxml', encoding='utf-8')
+        except ValueError:
+            # В документе нет таблиц
+            tables = []
     
-    # Находим все таблицы
-    tables = soup.find_all('table')
     print(f"Найдено таблиц в HTML: {len(tables)}")
     
     return tables
 
 
-def apply_sheet_formatting(worksheet, num_rows, num_cols):
+def excel_cell_value(value):
     """
-    Применяет форматирование к листу Excel
+    Приводит значение из DataFrame к виду, пригодному для записи в ячейку Excel
+    (так же, как это делает pandas при to_excel)
     
     Args:
-        worksheet: лист Excel (openpyxl worksheet)
-        num_rows: количество строк данных
-        num_cols: количество столбцов
+        value: значение ячейки DataFrame
+        
+    Returns:
+        значение для ячейки (None для пропусков, JSON строка для вложенных структур,
+        строка для бесконечностей)
     """
-    # Создаем заливки для цветов
-    header_fill = PatternFill(
-        start_color='{:02X}{:02X}{:02X}'.format(*HEADER_COLOR_RGB),
-        end_color='{:02X}{:02X}{:02X}'.format(*HEADER_COLOR_RGB),
-        fill_type='solid'
-    )
+    if isinstance(value, (list, dict)):
+        # Вложенные структуры записываются в JSON, чтобы их можно было разобрать обратно
+        return json.dumps(value, ensure_ascii=False)
+    if pd.isna(value):
+        return None
+    if isinstance(value, float) and math.isinf(value):
+        # Excel не хранит бесконечности; pandas записывал их строкой 'inf' (inf_rep)
+        return '-inf' if value < 0 else 'inf'
+    if isinstance(value, (str, bool, int, float)):
+        return value
+    return str(value)
+
+
+def normalize_dataset(dataset_name, dataset_values):
+    """
+    Преобразует список JSON объектов в плоскую таблицу
     
-    row_fill = PatternFill(
-        start_color='{:02X}{:02X}{:02X}'.format(*ROW_COLOR_RGB),
-        end_color='{:02X}{:02X}{:02X}'.format(*ROW_COLOR_RGB),
-        fill_type='solid'
+    Args:
+        dataset_name: имя набора данных
+        dataset_values: список записей (dict)
+        
+    Returns:
+        DataFrame: таблица с развернутыми вложенными полями
+    """
+    # Более глубокие уровни вложенности остаются в одной ячейке (в виде строки),
+    # а не порождают сотни почти пустых столбцов
+    return pd.json_normalize(
+        dataset_values,
+        record_path=DATASET_RECORD_PATHS.get(dataset_name),
+        max_level=JSON_NORMALIZE_MAX_LEVEL,
+        sep='.'
     )
+
+
+def prepare_dataset(dataset_name, dataset_values):
+    """
+    Подготавливает набор данных к записи: нормализует JSON и рассчитывает ширину столбцов
+    
+    Args:
+        dataset_name: имя набора данных
+        dataset_values: список записей (dict)
+        
+    Returns:
+        tuple: (DataFrame, ширина столбцов или None, если автоширина отключена)
+    """
+    df = normalize_dataset(dataset_name, dataset_values)
+    widths = calculate_column_widths(df) if ENABLE_AUTOFIT_COLUMNS else None
+    return df, widths
+
+
+def calculate_column_widths(df):
+    """
+    Вычисляет ширину столбцов по содержимому DataFrame
+    
+    Args:
+        df: DataFrame с данными листа
+        
+    Returns:
+        list: ширина каждого столбца (в символах)
+    """
+    # На больших листах ширину достаточно оценить по первым строкам (заголовок учитывается всегда)
+    sample = df.head(AUTOFIT_SAMPLE_ROWS)
+    
+    widths = []
+    for col in range(len(sample.columns)):
+        values = sample.iloc[:, col]
+        if values.dtype == object:
+            # Вложенные структуры измеряются в том виде, в котором попадут в ячейку (JSON)
+            values = values.map(excel_cell_value)
+        
+        # Длины строковых представлений считаются векторно, пропуски не учитываются
+        lengths = values[values.notna()].astype(str).str.len()
+        max_length = max(int(lengths.max()) if len(lengths) else 0, len(str(sample.columns[col])))
+        
+        # Ширина с небольшим запасом
+        widths.append(min(max_length + 2, 50))  # Максимум 50 символов
     
-    # Применяем форматирование к заголовкам (первая строка)
-    for col in range(1, num_cols + 1):
-        cell = worksheet.cell(row=1, column=col)
-        cell.fill = header_fill
-        cell.font = Font(bold=True)
+    return widths
+
+
+def apply_sheet_formatting(worksheet, df, widths):
+    """
+    Применяет форматирование к листу Excel (ширина столбцов и автофильтр).
+    В режиме write_only вызывается до записи первой строки.
     
-    # Применяем форматирование к строкам данных
-    for row in range(2, num_rows + 2):  # +2 потому что заголовок в строке 1, данные начинаются со строки 2
-        for col in range(1, num_cols + 1):
-            cell = worksheet.cell(row=row, column=col)
-            cell.fill = row_fill
+    Args:
+        worksheet: лист Excel (openpyxl write-only worksheet)
+        df: DataFrame с данными листа
+        widths: ширина столбцов (None - не задавать)
+    """
+    num_rows, num_cols = df.shape
     
     # Включаем автофильтр
     if ENABLE_AUTOFILTER and num_rows > 0:
         worksheet.auto_filter.ref = f'A1:{get_column_letter(num_cols)}{num_rows + 1}'
     
     # Автоматическое растягивание столбцов
-    if ENABLE_AUTOFIT_COLUMNS:
-        for col in range(1, num_cols + 1):
-            column_letter = get_column_letter(col)
-            
-            # Находим максимальную ширину в столбце
-            max_length = 0
-            for row in range(1, num_rows + 2):
-                cell = worksheet.cell(row=row, column=col)
-                try:
-                    if cell.value:
-                        cell_length = len(str(cell.value))
-                        if cell_length > max_length:
-                            max_length = cell_length
-                except:
-                    pass
-            
-            # Устанавливаем ширину столбца с небольшим запасом
-            adjusted_width = min(max_length + 2, 50)  # Максимум 50 символов
-            worksheet.column_dimensions[column_letter].width = adjusted_width
+    if widths is not None:
+        for col, width in enumerate(widths, start=1):
+            worksheet.column_dimensions[get_column_letter(col)].width = width
+
+
+def write_sheet(workbook, sheet_name, df, widths, formats=None):
+    """
+    Записывает DataFrame на новый лист книги с форматированием
+    
+    Args:
+        workbook: книга xlsxwriter или openpyxl (write_only=True)
+        sheet_name: имя листа
+        df: DataFrame с данными
+        widths: ширина столбцов (None - не задавать)
+        formats: форматы xlsxwriter {'header': ..., 'row': ...} (None для openpyxl)
+    """
+    if formats is not None:
+        write_sheet_xlsxwriter(workbook, sheet_name, df, widths, formats)
+    else:
+        write_sheet_openpyxl(workbook, sheet_name, df, widths)
+
+
+def write_sheet_xlsxwriter(workbook, sheet_name, df, widths, formats):
+    """
+    Записывает DataFrame на лист xlsxwriter (строки пишутся строго по порядку)
+    
+    Args:
+        workbook: книга xlsxwriter (constant_memory)
+        sheet_name: имя листа
+        df: DataFrame с данными
+        widths: ширина столбцов (None - не задавать)
+        formats: форматы заголовков и строк данных {'header': ..., 'row': ...}
+    """
+    worksheet = workbook.add_worksheet(sheet_name)
+    num_rows, num_cols = df.shape
+    
+    # Ширина столбцов и автофильтр - по одному вызову на столбец/лист
+    if widths is not None:
+        for col, width in enumerate(widths):
+            worksheet.set_column(col, col, width)
+    
+    if ENABLE_AUTOFILTER and num_rows > 0:
+        worksheet.autofilter(0, 0, num_rows, num_cols - 1)
+    
+    # Заголовки (первая строка)
+    worksheet.write_row(0, 0, [str(column) for column in df.columns], formats['header'])
+    
+    # Строки данных
+    for row_idx, row in enumerate(df.itertuples(index=False, name=None), start=1):
+        worksheet.write_row(row_idx, 0, [excel_cell_value(value) for value in row], formats['row'])
+
+
+def write_sheet_openpyxl(workbook, sheet_name, df, widths):
+    """
+    Записывает DataFrame на новый лист write-only книги openpyxl
+    
+    Args:
+        workbook: книга openpyxl (write_only=True)
+        sheet_name: имя листа
+        df: DataFrame с данными
+        widths: ширина столбцов (None - не задавать)
+    """
+    worksheet = workbook.create_sheet(title=sheet_name)
+    
+    # Ширины столбцов в режиме write_only задаются до записи строк
+    apply_sheet_formatting(worksheet, df, widths)
+    
+    # Стили назначаются один раз ячейкам-образцам; остальные ячейки получают копию
+    # их индексов стилей без повторного хеширования заливки и шрифта.
+    # Зависит от внутреннего устройства openpyxl (проверено на 3.1): стиль ячейки хранится
+    # в приватном атрибуте _style (StyleArray с индексами шрифта/заливки/... в таблицах
+    # стилей книги), и сам openpyxl копирует стили так же - copy(source_cell._style)
+    # в openpyxl/worksheet/copier.py. Индексы действительны, т.к. образцы принадлежат
+    # той же книге. Если это поведение изменится, вернуться к cell.fill/cell.font
+    # с общими HEADER_FILL, ROW_FILL и BOLD_FONT.
+    header_style = WriteOnlyCell(worksheet)
+    header_style.fill = HEADER_FILL
+    header_style.font = BOLD_FONT
+    
+    row_style = WriteOnlyCell(worksheet)
+    row_style.fill = ROW_FILL
+    
+    # Заголовки (первая строка)
+    header_cells = []
+    for column in df.columns:
+        cell = WriteOnlyCell(worksheet, value=str(column))
+        cell._style = copy(header_style._style)
+        header_cells.append(cell)
+    worksheet.append(header_cells)
+    
+    # Строки данных (itertuples заметно быстрее построчного доступа через iloc)
+    for row in df.itertuples(index=False, name=None):
+        row_cells = []
+        for value in row:
+            cell = WriteOnlyCell(worksheet, value=excel_cell_value(value))
+            cell._style = copy(row_style._style)
+            row_cells.append(cell)
+        worksheet.append(row_cells)
+
+
+def write_prepared_dataset(workbook, dataset_name, future, formats):
+    """
+    Записывает подготовленный в потоке набор данных на отдельный лист
+    
+    Args:
+        workbook: книга xlsxwriter или openpyxl (write_only=True)
+        dataset_name: имя набора данных
+        future: Future с результатом prepare_dataset
+        formats: форматы xlsxwriter (None для openpyxl)
+    """
+    try:
+        # Обработка вложенных данных
+        df, widths = future.result()
+        
+        # Ограничение длины имени листа (Excel максимум 31 символ)
+        sheet_name = dataset_name[:31]
+        
+        write_sheet(workbook, sheet_name, df, widths, formats)
+        
+        print(f"  ✓ Лист '{sheet_name}' создан ({len(df)} строк, {len(df.columns)} столбцов)")
+    except Exception as e:
+        print(f"  ✗ Ошибка при обработке '{dataset_name}': {e}")
 
 
 def save_to_excel(data, output_file):
     """
-    Сохраняет данные в Excel файл
+    Сохраняет данные в Excel файл (xlsxwriter в режиме constant_memory,
+    если установлен, иначе openpyxl в режиме write_only)
     
     Args:
         data: словарь с данными
@@ -178,53 +409,62 @@ def save_to_excel(data, output_file):
     """
     print(f"Сохранение данных в Excel: {output_file}")
     
-    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-        
-        # Сохраняем основные свойства
-        if 'properties' in data:
-            props_df = pd.DataFrame([data['properties']])
-            props_df.to_excel(writer, sheet_name='Properties', index=False)
-            
-            # Применяем форматирование
-            worksheet = writer.sheets['Properties']
-            apply_sheet_formatting(worksheet, len(props_df), len(props_df.columns))
-            
-            print(f"  ✓ Лист 'Properties' создан")
+    if xlsxwriter is not None:
+        # Строки сбрасываются на диск сразу после записи; строки не превращаются в формулы и ссылки
+        workbook = xlsxwriter.Workbook(str(output_file), {
+            'constant_memory': True,
+            'strings_to_formulas': False,
+            'strings_to_urls': False,
+        })
+        formats = {
+            'header': workbook.add_format(HEADER_FORMAT_PROPS),
+            'row': workbook.add_format(ROW_FORMAT_PROPS),
+        }
+    else:
+        workbook = Workbook(write_only=True)
+        formats = None
+    
+    # Сохраняем основные свойства
+    if 'properties' in data:
+        props_df = pd.DataFrame([data['properties']])
+        props_widths = calculate_column_widths(props_df) if ENABLE_AUTOFIT_COLUMNS else None
+        write_sheet(workbook, 'Properties', props_df, props_widths, formats)
         
-        # Сохраняем каждый dataset
-        if 'datasets' in data:
-            for dataset_name, dataset_values in data['datasets'].items():
-                if isinstance(dataset_values, list) and len(dataset_values) > 0:
-                    try:
-                        # Обработка вложенных данных
-                        df = pd.json_normalize(dataset_values)
-                        
-                        # Ограничение длины имени листа (Excel максимум 31 символ)
-                        sheet_name = dataset_name[:31]
-                        
-                        df.to_excel(writer, sheet_name=sheet_name, index=False)
-                        
-                        # Применяем форматирование
-                        worksheet = writer.sheets[sheet_name]
-                        apply_sheet_formatting(worksheet, len(df), len(df.columns))
-                        
-                        print(f"  ✓ Лист '{sheet_name}' создан ({len(df)} строк, {len(df.columns)} столбцов)")
-                    except Exception as e:
-                        print(f"  ✗ Ошибка при обработке '{dataset_name}': {e}")
+        print(f"  ✓ Лист 'Properties' создан")
+    
+    datasets = []
+    if 'datasets' in data:
+        for dataset_name, dataset_values in data['datasets'].items():
+            if isinstance(dataset_values, list) and len(dataset_values) > 0:
+                datasets.append((dataset_name, dataset_values))
+    
+    # Нормализация JSON и расчет ширины столбцов для следующих наборов идут в потоке,
+    # пока текущий лист записывается в книгу (книги xlsxwriter и openpyxl не потокобезопасны).
+    # Вперед готовится не больше PREPARE_AHEAD наборов, чтобы в памяти не копились все листы сразу.
+    with ThreadPoolExecutor(max_workers=PREPARE_AHEAD) as executor:
+        pending = deque()
+        for dataset_name, dataset_values in datasets:
+            pending.append((dataset_name, executor.submit(prepare_dataset, dataset_name, dataset_values)))
+            if len(pending) > PREPARE_AHEAD:
+                write_prepared_dataset(workbook, *pending.popleft(), formats)
         
-        # Сохраняем информацию о секциях
-        if 'sections' in data:
-            try:
-                sections_df = pd.json_normalize(data['sections'])
-                sections_df.to_excel(writer, sheet_name='Sections', index=False)
-                
-                # Применяем форматирование
-                worksheet = writer.sheets['Sections']
-                apply_sheet_formatting(worksheet, len(sections_df), len(sections_df.columns))
-                
-                print(f"  ✓ Лист 'Sections' создан")
-            except Exception as e:
-                print(f"  ✗ Ошибка при обработке секций: {e}")
+        while pending:
+            write_prepared_dataset(workbook, *pending.popleft(), formats)
+    
+    # Сохраняем информацию о секциях
+    if 'sections' in data:
+        try:
+            sections_df, sections_widths = prepare_dataset('sections', data['sections'])
+            write_sheet(workbook, 'Sections', sections_df, sections_widths, formats)
+            
+            print(f"  ✓ Лист 'Sections' создан")
+        except Exception as e:
+            print(f"  ✗ Ошибка при обработке секций: {e}")
+    
+    if xlsxwriter is not None:
+        workbook.close()
+    else:
+        workbook.save(output_file)
     
     print(f"\n✓ Данные успешно сохранены в {output_file}")
 
@@ -246,8 +486,10 @@ def process_html_file(html_file_path):
     print()
     
     try:
-        # Извлекаем данные
-        data = extract_data_from_html(html_file)
+        # Файл читается один раз, буфер передается всем этапам разбора
+        with open_html_content(html_file) as html_content:
+            # Извлекаем данные
+            data = extract_data_from_html(html_content)
         
         # Сохраняем в Excel
         save_to_excel(data, output_file)
@@ -268,6 +510,75 @@ def process_html_file(html_file_path):
         return False
 
 
+def scan_directory(directory, name_pattern):
+    """
+    Находит файлы одного каталога по маске имени (например, reports/*.html)
+    за один проход os.scandir
+    
+    Args:
+        directory: каталог ('' - текущий)
+        name_pattern: маска имени файла
+        
+    Returns:
+        list: пути найденных файлов
+    """
+    try:
+        with os.scandir(directory or '.') as entries:
+            names = [entry.name for entry in entries if entry.is_file()]
+    except OSError:
+        return []
+    
+    # Скрытые файлы, как и в glob, совпадают только с маской, начинающейся с точки
+    if not name_pattern.startswith('.'):
+        names = [name for name in names if not name.startswith('.')]
+    
+    return [os.path.join(directory, name) for name in fnmatch.filter(names, name_pattern)]
+
+
+def expand_file_patterns(file_patterns):
+    """
+    Раскрывает пути и маски HTML файлов из командной строки
+    
+    Args:
+        file_patterns: список путей или масок (*.html, ?, [seq], ** для подпапок)
+        
+    Returns:
+        list: список файлов без повторов
+    """
+    files = []
+    
+    # Один и тот же файл может совпасть с несколькими паттернами - обрабатываем его один раз
+    seen_paths = set()
+    
+    for file_pattern in file_patterns:
+        directory, name_pattern = os.path.split(file_pattern)
+        
+        if ('**' not in file_pattern
+                and not any(char in directory for char in '*?[')
+                and any(char in name_pattern for char in '*?[')):
+            # Простая маска в одном каталоге - достаточно одного прохода os.scandir
+            matched_files = scan_directory(directory, name_pattern)
+        else:
+            # glob сам обрабатывает и обычные пути, и сложные маски
+            matched_files = list(glob.iglob(file_pattern, recursive=True))
+        
+        if not matched_files and os.path.exists(file_pattern):
+            # Имя существующего файла само содержит символы маски (например, 'report[1].html')
+            matched_files = [file_pattern]
+        
+        if not matched_files:
+            print(f"⚠️ Предупреждение: паттерн '{file_pattern}' не совпал ни с одним файлом")
+            continue
+        
+        for file_path in matched_files:
+            real_path = os.path.realpath(file_path)
+            if real_path not in seen_paths:
+                seen_paths.add(real_path)
+                files.append(file_path)
+    
+    return files
+
+
 def main():
     """Основная функция"""
     # Парсинг аргументов командной строки
@@ -280,6 +591,7 @@ def main():
   %(prog)s report.html               # Обработать один файл
   %(prog)s *.html                    # Обработать все HTML файлы в текущей папке
   %(prog)s "20 RPS.html" "40 RPS.html"  # Обработать несколько конкретных файлов
+  %(prog)s "reports/**/*.html"       # Обработать файлы во всех подпапках
   %(prog)s C:/reports/*.html         # Обработать файлы по пути с маской
         """
     )
@@ -290,25 +602,20 @@ def main():
         help=f'Путь к HTML файлу(ам) или маска (*.html). По умолчанию: {DEFAULT_HTML_FILE}'
     )
     
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Количество файлов, обрабатываемых параллельно. По умолчанию: число ядер CPU'
+    )
+    
     args = parser.parse_args()
     
     # Определяем список файлов для обработки
     files_to_process = []
     
     if args.files:
-        # Обрабатываем каждый аргумент
-        for file_pattern in args.files:
-            # Проверяем, содержит ли паттерн wildcards
-            if '*' in file_pattern or '?' in file_pattern:
-                # Используем glob для поиска файлов
-                matched_files = glob.glob(file_pattern)
-                if matched_files:
-                    files_to_process.extend(matched_files)
-                else:
-                    print(f"⚠️ Предупреждение: паттерн '{file_pattern}' не совпал ни с одним файлом")
-            else:
-                # Обычный файл
-                files_to_process.append(file_pattern)
+        files_to_process = expand_file_patterns(args.files)
     else:
         # Используем файл по умолчанию
         default_path = Path(__file__).parent / DEFAULT_HTML_FILE
@@ -329,8 +636,16 @@ def main():
     success_count = 0
     failed_count = 0
     
-    for html_file in files_to_process:
-        if process_html_file(html_file):
+    # Файлы независимы друг от друга, поэтому несколько файлов обрабатываются в отдельных процессах
+    jobs = max(1, min(args.jobs, len(files_to_process)))
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(process_html_file, files_to_process))
+    else:
+        results = [process_html_file(html_file) for html_file in files_to_process]
+    
+    for result in results:
+        if result:
             success_count += 1
         else:
             failed_count += 1